@@ -0,0 +1 @@
+# Shared data loading and plotting helpers for the ICP dashboards
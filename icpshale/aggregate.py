@@ -0,0 +1,116 @@
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+AGG_KEYS = ["Shale_ID", "Element", "Group", "Sample_Type", "Time"]
+TOMB_KEYS = ["Element", "Sample_ID", "Time"]
+
+
+class Aggregates:
+    """Replicate mean, SD, SE and n per (Shale_ID, Element, Group,
+    Sample_Type, Time) over the kept rows of a PartitionedData.
+
+    Groups keep running sums, so when exclusions change only the groups
+    holding the added or restored points are updated.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        frame = data.frame
+        self._codes = pd.MultiIndex.from_frame(frame[AGG_KEYS].astype({"Time": float}))
+        self._rows = pd.MultiIndex.from_frame(frame[TOMB_KEYS].astype({"Time": float}))
+        self._values = frame["Concentration"].to_numpy(dtype=np.float64)
+        self._lock = threading.Lock()
+
+        # One grouped pass over every row, then the current tombstones taken out
+        values = pd.Series(self._values, index=self._codes)
+        grouped = values.groupby(level=list(range(len(AGG_KEYS))), observed=True, sort=True)
+        self.table = pd.DataFrame({"n": grouped.count(), "sum": grouped.sum(), "sumsq": (values ** 2).groupby(
+            level=list(range(len(AGG_KEYS))), observed=True, sort=True).sum()})
+        self.table.index.names = AGG_KEYS
+        self.table["n"] = self.table["n"].astype(np.float64)
+        self._applied = set()
+        self._version = None
+        self.refresh()
+
+    def _tombstones(self):
+        store = self.data.exclusions
+        if store is None:
+            return set()
+        return set(store.excluded().itertuples(index=False, name=None))
+
+    def _adjust(self, tombs, sign):
+        if not tombs:
+            return set()
+        wanted = pd.MultiIndex.from_tuples(sorted(tombs), names=TOMB_KEYS)
+        rows = np.flatnonzero(self._rows.isin(wanted))
+        keys = self._codes[rows]
+        delta = pd.DataFrame({
+            "n": np.full(len(rows), sign, dtype=np.float64),
+            "sum": sign * self._values[rows],
+            "sumsq": sign * self._values[rows] ** 2,
+        }, index=keys).groupby(level=list(range(len(AGG_KEYS)))).sum()
+        delta.index.names = AGG_KEYS
+        self.table.loc[delta.index, ["n", "sum", "sumsq"]] += delta.to_numpy()
+        return set(delta.index)
+
+    def refresh(self):
+        """Bring the table in line with the exclusion store. Returns the
+        number of groups that were updated."""
+        version = self.data.version()
+        if version == self._version:
+            return 0
+        with self._lock:
+            if version == self._version:
+                return 0
+            current = self._tombstones()
+            touched = self._adjust(current - self._applied, -1) | self._adjust(self._applied - current, 1)
+            self._applied = current
+            self._version = version
+            if touched or "mean" not in self.table:
+                self._derive(None if "mean" not in self.table else pd.MultiIndex.from_tuples(sorted(touched), names=AGG_KEYS))
+            return len(touched)
+
+    def _derive(self, index=None):
+        t = self.table if index is None else self.table.loc[index]
+        n, s, ss = t["n"].to_numpy(), t["sum"].to_numpy(), t["sumsq"].to_numpy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = s / n
+            var = np.clip(ss - s * mean, 0, None) / (n - 1)
+        std = np.sqrt(var)
+        derived = {"mean": np.where(n > 0, mean, np.nan), "std": np.where(n > 1, std, np.nan)}
+        derived["se"] = derived["std"] / np.sqrt(np.where(n > 0, n, np.nan))
+        if index is None:
+            for col, values in derived.items():
+                self.table[col] = values
+        else:
+            self.table.loc[index, list(derived)] = np.column_stack(list(derived.values()))
+
+    def series(self, shale, element, sample_types=None):
+        """Aggregated rows of one shale and element, one row per
+        (Group, Sample_Type, Time), groups with no kept points dropped."""
+        self.refresh()
+        with self._lock:
+            try:
+                rows = self.table.loc[(shale, element)].copy()
+            except KeyError:
+                return self.table.iloc[:0].reset_index()
+        rows = rows[rows["n"] > 0].reset_index()
+        if sample_types:
+            rows = rows[rows["Sample_Type"].isin(sample_types)]
+        return rows
+
+
+_aggregates = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def aggregates(data):
+    """The Aggregates of a PartitionedData snapshot, built on first use."""
+    with _lock:
+        agg = _aggregates.get(data)
+        if agg is None:
+            agg = _aggregates[data] = Aggregates(data)
+        return agg
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+# phO2.csv was logged during the BIS run, whose shales are "<number>-BIS" in the ICP table
+PH_O2_SHALE_SUFFIX = "-BIS"
+PH_O2_COLUMNS = ["Shale_Number", "Sample_Type", "Group", "Timepoint", "pH", "Clock_Time", "O2"]
+JOIN_KEYS = ["Shale_ID", "Sample_Type", "Group"]
+
+
+def _midpoint(values):
+    # Readings such as "7.5-8" are ranges; use their midpoint
+    bounds = values.astype("str").str.extract(r"^\s*([0-9.]+)\s*(?:-\s*([0-9.]+))?\s*$").astype(float)
+    return bounds.mean(axis=1)
+
+
+def load_ph_o2(path):
+    """Normalize phO2.csv: its duplicated TIMEPOINT header is positional, the
+    first holding "t0.5"-style timepoints and the second clock times."""
+    df = pd.read_csv(path, na_values=["N/A"])
+    df.columns = PH_O2_COLUMNS
+    df["Shale_ID"] = df["Shale_Number"].astype(str) + PH_O2_SHALE_SUFFIX
+    df["Time"] = df["Timepoint"].str.extract(r"t([0-9.]+)", expand=False).astype(float)
+    df["pH"] = _midpoint(df["pH"]).astype(np.float32)
+    df["O2"] = pd.to_numeric(df["O2"], errors="coerce").astype(np.float32)
+    return df.dropna(subset=["Time"])
+
+
+def align_ph_o2(icp, ph_o2, tolerance=0.25):
+    """Attach the nearest pH/O2 reading (within `tolerance` days) to every ICP
+    row with the same shale, sample type and treatment group."""
+    left = pd.DataFrame({k: icp[k].astype("str") for k in JOIN_KEYS})
+    left["Time"] = icp["Time"].to_numpy()
+    left["_row"] = np.arange(len(icp))
+    left = left.dropna(subset=["Time"]).sort_values("Time")
+
+    right = pd.DataFrame({k: ph_o2[k].astype("str") for k in JOIN_KEYS})
+    right["Aligned_Time"] = right["Time"] = ph_o2["Time"].to_numpy()
+    right["Aligned_pH"] = ph_o2["pH"].to_numpy()
+    right["Aligned_O2"] = ph_o2["O2"].to_numpy()
+    right = right.sort_values("Time")
+
+    joined = pd.merge_asof(left, right, on="Time", by=JOIN_KEYS, tolerance=tolerance, direction="nearest")
+    out = icp.copy()
+    for col, dtype in [("Aligned_Time", np.float64), ("Aligned_pH", np.float32), ("Aligned_O2", np.float32)]:
+        values = np.full(len(icp), np.nan, dtype=dtype)
+        values[joined["_row"].to_numpy()] = joined[col].to_numpy()
+        out[col] = values
+    return out
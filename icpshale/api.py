@@ -0,0 +1,112 @@
+import hashlib
+import json
+
+import flask
+
+from icpshale import derived, metrics
+from icpshale.units import get_units
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow responses are optional
+    pa = None
+
+SERIES_COLUMNS = ["Sample_ID", "Sample_Combo", "Sample_Type", "Group", "Time", "Concentration", "Flags"]
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+
+
+def available_formats():
+    return ["json"] + (["arrow"] if pa is not None else [])
+
+
+def etag(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+
+
+def json_columns(frame):
+    """Column-oriented JSON of a frame, e.g. {"Time": [0.0, 0.5], ...}, NaN as null."""
+    body = ",".join(f"{json.dumps(col)}:{frame[col].to_json(orient='values')}" for col in frame.columns)
+    return "{" + body + "}"
+
+
+def arrow_stream(frame):
+    # A slice keeps the whole dataset's categories; send only the ones it uses
+    frame = frame.apply(lambda col: col.cat.remove_unused_categories() if col.dtype == "category" else col)
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def register(server, dataset):
+    """Add read-only /api/elements and /api/series routes for a Dataset.
+
+    /api/elements?shale= lists a shale's elements and derived quantities, or
+    every shale's elements without one. /api/series?shale=&element=&
+    sample_type=&format=json|arrow returns the kept points of one series,
+    column-oriented. Responses carry an ETag of the dataset fingerprint and
+    exclusion version, so a matching If-None-Match is answered with 304
+    before any rows are read.
+    """
+    def conditional(tag, build, mimetype):
+        if flask.request.if_none_match.contains(tag):
+            response = flask.Response(status=304)
+        else:
+            response = flask.Response(build(), mimetype=mimetype)
+        response.set_etag(tag)
+        # Cacheable, but revalidated since exclusions can change at any time
+        response.cache_control.no_cache = True
+        return response
+
+    @server.route("/api/elements")
+    @metrics.instrument("api_elements")
+    def api_elements():
+        data = dataset.snapshot()
+        shale = flask.request.args.get("shale")
+        if shale and shale not in data.elements:
+            flask.abort(404, f"Unknown shale {shale!r}")
+
+        def build():
+            if not shale:
+                return json.dumps({"dataset": dataset.name, "shales": data.elements})
+            elements = data.elements[shale]
+            return json.dumps({"dataset": dataset.name, "shale": shale, "elements": elements, "derived": derived.options(elements)})
+        return conditional(etag(data.version()[0], shale), build, "application/json")
+
+    @server.route("/api/series")
+    @metrics.instrument("api_series")
+    def api_series():
+        args = flask.request.args
+        shale, element = args.get("shale"), args.get("element")
+        sample_types = args.getlist("sample_type") or None
+        fmt = args.get("format", "json")
+        if not shale or not element:
+            flask.abort(400, "shale and element are required")
+        if fmt not in available_formats():
+            flask.abort(400, f"format must be one of {', '.join(available_formats())}")
+        data = dataset.snapshot()
+        if derived.is_derived(element):
+            if shale not in data.elements:
+                flask.abort(404, f"Unknown shale {shale!r}")
+            version = data.version()
+        elif (shale, element) in data.slices:
+            version = data.version(element)
+        else:
+            flask.abort(404, f"No {element} series for shale {shale!r}")
+
+        def build():
+            try:
+                source = derived.view(data, shale, element) if derived.is_derived(element) else data
+            except ValueError as exc:
+                flask.abort(400, str(exc))
+            rows = source.select(shale, element, sample_types)
+            rows = rows[[c for c in SERIES_COLUMNS if c in rows.columns]]
+            if fmt == "arrow":
+                return arrow_stream(rows)
+            return "{" + ",".join([
+                f'"shale":{json.dumps(shale)}', f'"element":{json.dumps(element)}',
+                f'"unit":{json.dumps(get_units(source.frame))}', f'"columns":{json_columns(rows)}'
+            ]) + "}"
+        tag = etag(version, shale, element, tuple(sorted(sample_types or [])), fmt)
+        return conditional(tag, build, ARROW_MIMETYPE if fmt == "arrow" else "application/json")
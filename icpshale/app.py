@@ -0,0 +1,470 @@
+import argparse
+import gc
+
+import dash
+import pandas as pd
+from dash import dash_table, dcc, html, ALL, Input, Output, State, ClientsideFunction, ctx
+from dash.dash_table.Format import Format, Scheme
+import dash_bootstrap_components as dbc
+
+from icpshale import api, derived, export, jobs, kinetics, metrics, outliers, warmup
+from icpshale.aggregate import aggregates
+from icpshale.datasets import DATASETS, load_dataset
+from icpshale.downsample import MAX_TRACE_POINTS, zoom_range
+from icpshale.figcache import FigureCache
+from icpshale.figures import add_flagged, build_band_figure, build_figure, build_panel, build_raw_figure, compact
+from icpshale.units import get_units
+
+# The four views that used to be separate scripts, and the dataset each one shows by default
+MODES = {
+    "explorer": {"dataset": "full_cleaned_icp_pho2_mM", "title": "ICP Plot Explorer"},
+    "basic": {"dataset": "cleaned_icp_data", "title": "ICP Plot Explorer"},
+    "raw": {"dataset": "combined_raw", "title": "ICP Plot Explorer"},
+    "ph_o2": {"dataset": "cleaned_icp_data_ph_o2", "title": "ICP + pH/O₂ Dashboard"},
+}
+FONT_SIZE = 14
+POINT_SIZE = 10
+
+
+def swatch(color, label):
+    return [
+        html.Li("", style={"listStyleType": "none", "display": "inline-block", "width": "15px", "height": "15px", "backgroundColor": color, "marginRight": "8px"}),
+        html.Span(label),
+        html.Br(),
+    ]
+
+
+def legend(mode):
+    if mode == "raw":
+        items = swatch("#8B0000", "O₂ + CO₂") + swatch("#FF6347", "O₂ only") + swatch("#00008B", "no O₂ + CO₂") + swatch("#4682B4", "no O₂")
+        items = items[:-1]
+    else:
+        items = swatch("#FF0000", "O₂ present") + swatch("#0000FF", "O₂ absent") + [
+            html.Span("Line Style: ", style={"marginRight": "8px", "fontWeight": "bold"}),
+            html.Span("Solid = CO₂ present, Dashed = CO₂ absent")
+        ]
+    return html.Div([html.H6("O₂ / CO₂ Condition Legend:"), html.Ul(items)], style={"fontSize": "14px", "marginTop": "10px"})
+
+
+def mode_sample_types(mode, data):
+    if mode == "ph_o2":
+        return data.frame["Sample_Type"].dropna().unique().tolist()
+    return ["Disk", "Dust"]
+
+
+def controls(mode, data, editable):
+    shale_value = None if mode == "explorer" else "64"
+    sample_types = mode_sample_types(mode, data)
+    if mode == "ph_o2":
+        element_names = sorted(data.frame["Element"].dropna().unique())
+        element = dcc.Dropdown(id="element", options=[{"label": e, "value": e} for e in element_names], value="Mg")
+        sample_value = ["Disk"]
+    else:
+        element = dcc.Dropdown(id="element")
+        sample_value = sample_types
+
+    children = [
+        html.Label("Shale ID"),
+        dcc.Dropdown(id="shale_id", options=[{"label": sid, "value": sid} for sid in data.shales], value=shale_value),
+        html.Label("Element"),
+        element,
+        html.Label("Sample Type"),
+        dcc.Checklist(id="sample_type", options=[{"label": t, "value": t} for t in sample_types], value=sample_value, inline=True),
+    ]
+    if mode == "explorer":
+        children += [
+            html.Label("View"),
+            dcc.RadioItems(
+                id="view",
+                options=[
+                    {"label": "Single element", "value": "single"},
+                    {"label": "Replicate mean", "value": "mean"},
+                    {"label": "All elements", "value": "all"}
+                ],
+                value="single",
+                inline=True
+            ),
+            dcc.RadioItems(
+                id="band",
+                options=[{"label": "± SD", "value": "std"}, {"label": "± SE", "value": "se"}],
+                value="std",
+                inline=True
+            ),
+            html.Label("Shared Axes"),
+            dcc.Checklist(
+                id="shared_axes",
+                options=[{"label": "Time", "value": "x"}, {"label": "Concentration", "value": "y"}],
+                value=["x"],
+                inline=True
+            ),
+            dcc.Checklist(id="downsample", options=[{"label": "Downsample long series", "value": "on"}], value=["on"]),
+        ]
+    if mode == "ph_o2":
+        children += [
+            html.Label("Overlay"),
+            dcc.RadioItems(
+                id="overlay",
+                options=[{"label": "None", "value": ""}, {"label": "pH", "value": "pH"}, {"label": "O₂", "value": "O2"}],
+                value="",
+                inline=True
+            ),
+        ]
+    if mode != "raw":
+        children += [
+            dcc.Checklist(id="show_fits", options=[{"label": "Show kinetic fits", "value": "on"}], value=[]),
+        ]
+    children += [
+        html.Label("Font Size"),
+        dcc.Slider(8, 22, 1, value=FONT_SIZE, id="font_size"),
+        html.Label("Point Size"),
+        dcc.Slider(3, 20, 1, value=POINT_SIZE, id="point_size"),
+    ]
+    if editable:
+        children += [
+            html.Label("Outliers"),
+            dcc.RadioItems(
+                id="outlier_method",
+                options=[{"label": "Off", "value": ""}] + [{"label": label, "value": m} for m, label in outliers.METHODS.items()],
+                value="",
+                inline=True
+            ),
+            html.Button("Exclude Flagged in Shale", id="accept_btn", n_clicks=0),
+            html.Button("Reset Data", id="reset_btn", n_clicks=0),
+            html.Label("Export"),
+            dcc.RadioItems(
+                id="export_scope",
+                options=[{"label": "Selection", "value": "selection"}, {"label": "All data", "value": "all"}],
+                value="selection",
+                inline=True
+            ),
+            dcc.RadioItems(id="export_format", options=export.available_formats(), value="csv.gz", inline=True),
+            html.A(html.Button("Download"), id="download_link", href=export.export_url("csv.gz")),
+            html.A(html.Button("Download Exclusions"), href="/export/exclusions?format=csv"),
+            html.Label("Background Jobs"),
+            html.Button("Export in Background", id="export_job_btn", n_clicks=0),
+            html.Button("Batch Fits", id="fits_job_btn", n_clicks=0),
+            html.Div(id="jobs"),
+            dcc.Interval(id="jobs_poll", interval=1000)
+        ]
+    return children
+
+
+def job_row(job):
+    active = job["state"] in jobs.ACTIVE
+    status = f"{job['label']}: {job['state']}" + (f" ({job['message']})" if job["message"] else "")
+    color = {"done": "success", "failed": "danger", "cancelled": "secondary"}.get(job["state"], "primary")
+    children = [
+        html.Small(status),
+        dbc.Progress(value=100 * job["progress"], color=color, striped=active, animated=active, style={"height": "8px"}),
+    ]
+    if active:
+        children.append(html.Button("Cancel", id={"type": "cancel_job", "id": job["id"]}, n_clicks=0))
+    if job["state"] == "done":
+        children.append(html.A("Download", href=f"/jobs/{job['id']}/result"))
+    return html.Div(children, style={"marginBottom": "6px"})
+
+
+def element_options(data, shale_id):
+    """Element dropdown of a shale: its measured elements, then derived quantities."""
+    elements = data.elements.get(shale_id, [])
+    return [{"label": e, "value": e} for e in elements + derived.options(elements)]
+
+
+def combo_fits(data, shale_id, element, sample_type):
+    fits = kinetics.fits(data, sample_type)
+    return fits[(fits["Shale_ID"] == shale_id) & (fits["Element"] == element)].set_index(["Sample_Combo", "Sample_Type"])
+
+
+def series_source(data, shale_id, element):
+    # Ratios and normalized series come from a derived view; exclusions still go to the measured data
+    return derived.view(data, shale_id, element) if derived.is_derived(element) else data
+
+
+def opening_view(mode):
+    # Single-view settings a page opens with, as single_key/build_single keyword arguments
+    return {"font_size": FONT_SIZE, "point_size": POINT_SIZE, "max_points": MAX_TRACE_POINTS if mode == "explorer" else None}
+
+
+def single_key(data, shale_id, element, sample_type, font_size, point_size, max_points=None, overlay="", show_fits=None, outlier_method=""):
+    source = series_source(data, shale_id, element)
+    return (shale_id, element, tuple(sorted(sample_type or [])), max_points, overlay, bool(show_fits), outlier_method, font_size, point_size) + source.version(element)
+
+
+def build_single(data, mode, shale_id, element, sample_type, font_size, point_size, max_points=None, overlay="", show_fits=None,
+                 outlier_method="", x_range=None):
+    """The single-element figure of update_plot, also used by the warm-up and
+    the pre-render CLI."""
+    source = series_source(data, shale_id, element)
+    if mode == "raw":
+        fig = build_raw_figure(source, shale_id, element, sample_type, font_size, point_size)
+    else:
+        fits = combo_fits(source, shale_id, element, sample_type) if show_fits else None
+        fig = build_figure(source, shale_id, element, sample_type, font_size, point_size, max_points, x_range, overlay=overlay, fits=fits)
+    if outlier_method and not derived.is_derived(element):
+        flagged = outliers.detect(data, outlier_method, sample_types=sample_type)
+        add_flagged(fig, flagged[(flagged["Shale_ID"] == shale_id) & (flagged["Element"] == element)], point_size)
+    return fig
+
+
+def create_app(dataset=None, mode="explorer"):
+    """Dash app for one of the MODES views over a registered dataset.
+
+    Data is loaded once per process and only read afterwards; exclusions
+    live in SQLite, so serving under ``gunicorn --preload`` keeps a single
+    copy of the data shared by all workers. Source changes are picked up by
+    the dataset's watcher, and every request works on one snapshot.
+    """
+    dataset = dataset or MODES[mode]["dataset"]
+    live = load_dataset(dataset)
+    editable = live.exclusions is not None
+
+    app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+    server = app.server
+    metrics.register(server)
+    export.register(server, live)
+    api.register(server, live)
+    server.before_request(live.watch)
+    # Heavy work runs in job processes so workers stay free for plots
+    queue = jobs.JobQueue(live)
+    jobs.register(server, queue)
+    server.before_request(queue.start)
+    figure_cache = FigureCache()
+
+    @server.route("/_figure_cache")
+    def figure_cache_stats():
+        return figure_cache.stats()
+
+    # Optional background build of every opening-view figure into the cache
+    def fill(data, shale_id, element, sample_type):
+        view = opening_view(mode)
+        figure_cache.get_or_build(
+            single_key(data, shale_id, element, sample_type, **view),
+            lambda: compact(build_single(data, mode, shale_id, element, sample_type, **view))
+        )
+    warm = warmup.Warmup(live, lambda data: warmup.catalogue(data, mode_sample_types(mode, data)), fill)
+    if warmup.ENABLED:
+        server.before_request(warm.start)
+
+    @server.route("/_warmup")
+    def warmup_stats():
+        return warm.stats()
+
+    # update_plot fills plot_payload with the compact wire form; icp.expand draws it
+    graph = [dcc.Graph(id="plot", config={"displaylogo": False}), dcc.Store(id="plot_payload")]
+    if editable:
+        graph += [html.Div(id="click_log"), html.Br()]
+    if mode != "raw":
+        graph += [html.H6("Kinetic fits"), dash_table.DataTable(
+            id="fit_table",
+            columns=[
+                {"name": c, "id": c, "type": "numeric", "format": Format(precision=4, scheme=Scheme.decimal_or_exponent)}
+                if c not in kinetics.GROUP_KEYS else {"name": c, "id": c}
+                for c in kinetics.FIT_COLUMNS[1:]
+            ],
+            sort_action="native", filter_action="native", page_size=12,
+            style_table={"overflowX": "auto"}, style_cell={"fontSize": "12px"}
+        )]
+    heading = html.H3 if mode == "ph_o2" else html.H2
+
+    # Built per page load so a reloaded dataset's shales show up
+    def layout():
+        return dbc.Container([
+            heading(MODES[mode]["title"]),
+            dbc.Row([
+                dbc.Col(controls(mode, live.snapshot(), editable), width=3),
+                dbc.Col(graph + [legend(mode)])
+            ])
+        ])
+
+    app.layout = layout
+
+    if mode != "ph_o2":
+        @app.callback(
+            Output("element", "options"),
+            Input("shale_id", "value")
+        )
+        @metrics.instrument("update_elements")
+        def update_elements(shale_id):
+            return element_options(live.snapshot(), shale_id)
+
+    # Each mode only wires up the controls it shows
+    inputs = dict(
+        shale_id=Input("shale_id", "value"),
+        element=Input("element", "value"),
+        sample_type=Input("sample_type", "value"),
+        font_size=State("font_size", "value"),
+        point_size=State("point_size", "value"),
+    )
+    if mode == "explorer":
+        inputs.update(
+            view=Input("view", "value"),
+            band=Input("band", "value"),
+            shared_axes=Input("shared_axes", "value"),
+            downsample=Input("downsample", "value"),
+            relayoutData=Input("plot", "relayoutData"),
+        )
+    if mode == "ph_o2":
+        inputs.update(overlay=Input("overlay", "value"))
+    if mode != "raw":
+        inputs.update(show_fits=Input("show_fits", "value"))
+    if editable:
+        inputs.update(
+            clickData=Input("plot", "clickData"),
+            selectedData=Input("plot", "selectedData"),
+            reset_clicks=Input("reset_btn", "n_clicks"),
+            outlier_method=Input("outlier_method", "value"),
+            accept_clicks=Input("accept_btn", "n_clicks"),
+        )
+
+    @app.callback(Output("plot_payload", "data"), inputs=inputs)
+    @metrics.instrument("update_plot")
+    def update_plot(shale_id, element, sample_type, font_size, point_size, view="single", band="std", shared_axes=None,
+                    downsample=None, overlay="", show_fits=None, relayoutData=None, clickData=None, selectedData=None,
+                    reset_clicks=None, outlier_method="", accept_clicks=None):
+        data = live.snapshot()
+        max_points = MAX_TRACE_POINTS if downsample else None
+        measured = not derived.is_derived(element)
+
+        # Zooming in re-fetches the visible range at full resolution (still capped
+        # at max_points); other relayout events such as autosize are ignored
+        if "plot.relayoutData" in ctx.triggered_prop_ids:
+            x_range = zoom_range(relayoutData)
+            if x_range is not None and view == "single":
+                return compact(build_single(data, mode, shale_id, element, sample_type, font_size, point_size, max_points,
+                                            overlay, show_fits, outlier_method, x_range))
+            if not (relayoutData or {}).get("xaxis.autorange"):
+                return dash.no_update
+
+        if ctx.triggered_id == "reset_btn":
+            data.reset()
+
+        if clickData and "plot.clickData" in ctx.triggered_prop_ids and measured:
+            pt = clickData["points"][0]
+            clicked_id = pt["text"] if "text" in pt else None
+            if clicked_id:
+                # Panel points carry their element, the single view uses the dropdown
+                data.exclude(pt.get("customdata") or element, clicked_id, pt["x"])
+
+        # Lasso/box selections and accepted outliers go in as one exclusion each
+        if selectedData and "plot.selectedData" in ctx.triggered_prop_ids and measured:
+            points = [pt for pt in selectedData["points"] if pt.get("text")]
+            data.exclude_many(pd.DataFrame({
+                "Element": [pt.get("customdata") if isinstance(pt.get("customdata"), str) else element for pt in points],
+                "Sample_ID": [pt["text"] for pt in points],
+                "Time": [pt["x"] for pt in points],
+            }))
+
+        if ctx.triggered_id == "accept_btn" and outlier_method:
+            flagged = outliers.detect(data, outlier_method, sample_types=sample_type)
+            data.exclude_many(flagged[flagged["Shale_ID"] == shale_id])
+
+        sample_key = tuple(sorted(sample_type or []))
+        if view == "all":
+            key = ("all", shale_id, sample_key, tuple(sorted(shared_axes or [])), max_points, font_size, point_size) + data.version()
+            return figure_cache.get_or_build(key, lambda: compact(build_panel(data, shale_id, sample_type, shared_axes or [], font_size, point_size, max_points)))
+        if view == "mean":
+            source = series_source(data, shale_id, element)
+            key = ("mean", shale_id, element, sample_key, band, font_size, point_size) + source.version(element)
+            return figure_cache.get_or_build(key, lambda: compact(build_band_figure(aggregates(source), shale_id, element, sample_type, font_size, point_size, band, get_units(source.frame))))
+        view_args = (shale_id, element, sample_type, font_size, point_size, max_points, overlay, show_fits, outlier_method)
+        return figure_cache.get_or_build(single_key(data, *view_args), lambda: compact(build_single(data, mode, *view_args)))
+
+    if mode != "raw":
+        # Follows the figure so it sees the exclusions update_plot just made
+        @app.callback(
+            Output("fit_table", "data"),
+            Input("plot_payload", "data"),
+            State("shale_id", "value"),
+            State("sample_type", "value")
+        )
+        def update_fit_table(fig, shale_id, sample_type):
+            fits = kinetics.fits(live.snapshot(), sample_type)
+            fits = fits[fits["Shale_ID"] == shale_id][kinetics.FIT_COLUMNS[1:]]
+            return fits.astype(object).where(fits.notna(), None).to_dict("records")
+
+    if editable:
+        # Downloads stream from /export/data; this only keeps the link in step with the selection
+        @app.callback(
+            Output("download_link", "href"),
+            Input("export_scope", "value"),
+            Input("export_format", "value"),
+            Input("shale_id", "value"),
+            Input("element", "value"),
+            Input("sample_type", "value")
+        )
+        def update_download_link(scope, fmt, shale_id, element, sample_type):
+            if scope == "all":
+                return export.export_url(fmt)
+            return export.export_url(fmt, shale_id, element, sample_type)
+
+    if editable:
+        # Polls while jobs are active; prevent_initial_call keeps freshly drawn
+        # Cancel buttons from re-triggering it
+        @app.callback(
+            Output("jobs", "children"),
+            Output("jobs_poll", "disabled"),
+            Input("jobs_poll", "n_intervals"),
+            Input("export_job_btn", "n_clicks"),
+            Input("fits_job_btn", "n_clicks"),
+            Input({"type": "cancel_job", "id": ALL}, "n_clicks"),
+            State("export_scope", "value"),
+            State("export_format", "value"),
+            State("shale_id", "value"),
+            State("element", "value"),
+            State("sample_type", "value"),
+            prevent_initial_call=True
+        )
+        def update_jobs(n_intervals, export_clicks, fits_clicks, cancel_clicks, scope, fmt, shale_id, element, sample_type):
+            if ctx.triggered_id == "export_job_btn":
+                params = {"format": fmt} if scope == "all" else {"format": fmt, "shale": shale_id, "element": element, "sample_types": sample_type}
+                queue.submit("export", params)
+            elif ctx.triggered_id == "fits_job_btn":
+                queue.submit("fits", {"sample_types": sample_type})
+            elif isinstance(ctx.triggered_id, dict) and ctx.triggered[0]["value"]:
+                queue.cancel(ctx.triggered_id["id"])
+            listed = queue.list()
+            return [job_row(job) for job in listed], not any(job["state"] in jobs.ACTIVE for job in listed)
+
+    app.clientside_callback(
+        ClientsideFunction(namespace="icp", function_name="expand"),
+        Output("plot", "figure"),
+        Input("plot_payload", "data")
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace="icp", function_name="restyle"),
+        Output("plot", "figure", allow_duplicate=True),
+        Input("font_size", "value"),
+        Input("point_size", "value"),
+        State("plot", "figure"),
+        prevent_initial_call=True
+    )
+
+    # Keep the collector from touching (and so copying) objects a forked worker inherits
+    gc.freeze()
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run one of the ICP dashboards.")
+    parser.add_argument("--mode", choices=MODES, default="explorer")
+    parser.add_argument("--dataset", choices=DATASETS)
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("--prerender", metavar="DIR", help="write every single-element figure to DIR and exit")
+    parser.add_argument("--format", choices=["json", "html"], default="json", help="pre-rendered figure format")
+    parser.add_argument("--processes", type=int, help="pre-render worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+    if args.prerender:
+        data = load_dataset(args.dataset or MODES[args.mode]["dataset"]).snapshot()
+        view = opening_view(args.mode)
+        index = warmup.prerender(
+            data, warmup.catalogue(data, mode_sample_types(args.mode, data)),
+            lambda data, shale_id, element, sample_type: build_single(data, args.mode, shale_id, element, sample_type, **view),
+            args.prerender, args.format, args.processes
+        )
+        print(f"wrote {len(index)} figures to {args.prerender}")
+        return
+    create_app(args.dataset, args.mode).run(debug=True, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+// Figure updates that never reach the server
+const TYPED_ARRAYS = {i1: Int8Array, u1: Uint8Array, i2: Int16Array, u2: Uint16Array, i4: Int32Array, u4: Uint32Array};
+
+function decodeArray(values) {
+    if (!values || !values.bdata) {
+        return values;
+    }
+    const bytes = Uint8Array.from(atob(values.bdata), function(c) { return c.charCodeAt(0); });
+    return new TYPED_ARRAYS[values.dtype](bytes.buffer);
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    icp: {
+        // Undo icpshale.figures.compact: label codes in customdata back to text
+        expand: function(fig) {
+            const meta = fig && fig.layout && fig.layout.meta;
+            if (!meta || !meta.labels) {
+                return fig || window.dash_clientside.no_update;
+            }
+            const encoded = new Set(meta.encoded);
+            const data = fig.data.map(function(trace, i) {
+                if (!encoded.has(i)) {
+                    return trace;
+                }
+                const codes = Array.from(decodeArray(trace.customdata));
+                const out = Object.assign({}, trace, {text: codes.map(function(c) { return meta.labels[c]; })});
+                if (typeof trace.meta === "string") {
+                    out.customdata = codes.map(function() { return trace.meta; });
+                } else {
+                    delete out.customdata;
+                }
+                return out;
+            });
+            const layout = Object.assign({}, fig.layout);
+            delete layout.meta;
+            return Object.assign({}, fig, {data: data, layout: layout});
+        },
+        restyle: function(fontSize, pointSize, fig) {
+            if (!fig || !fig.data) {
+                return window.dash_clientside.no_update;
+            }
+            const layout = Object.assign({}, fig.layout);
+            layout.font = Object.assign({}, layout.font, {size: fontSize});
+            const title = typeof layout.title === "string" ? {text: layout.title} : Object.assign({}, layout.title);
+            title.font = Object.assign({}, title.font, {size: fontSize + 4});
+            layout.title = title;
+            const data = fig.data.map(function(trace) {
+                // Outlier rings (icpshale.figures.add_flagged) stay larger than the points
+                const size = trace.meta && trace.meta.ring ? pointSize + trace.meta.ring : pointSize;
+                return Object.assign({}, trace, {marker: Object.assign({}, trace.marker, {size: size})});
+            });
+            return Object.assign({}, fig, {data: data, layout: layout});
+        }
+    }
+});
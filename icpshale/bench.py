@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from plotly.io.json import to_json_plotly
+
+from icpshale import export
+from icpshale.app import element_options
+from icpshale.figures import build_figure, build_panel, compact
+from icpshale.ingest import load_experiment
+from icpshale.partition import PartitionedData
+from icpshale.schema import enforce_schema
+from icpshale.units import MOLAR_MASSES, convert_units, set_units
+
+SCALES = [1, 10, 100, 1000]
+TIMES = [0, 0.5, 1, 2, 3, 4, 7, 9, 15, 18, 23, 42]
+GROUPS = ["A", "B", "C", "D"]
+SAMPLE_TYPES = ["Disk", "Dust"]
+ELEMENTS = list(MOLAR_MASSES)
+# Shales per 1x; close to the row count of full_cleaned_icp_pho2.csv
+SHALES_PER_SCALE = 5
+RAW_SHALES_PER_SCALE = 4
+
+
+def synth_long(scale, seed=0):
+    """Long table shaped like full_cleaned_icp_pho2.csv."""
+    rng = np.random.default_rng(seed)
+    elements = ELEMENTS + ["pH", "O2"]
+    n_shales = SHALES_PER_SCALE * scale
+    shale, group, stype, t, element = (a.ravel() for a in np.meshgrid(
+        np.arange(n_shales), np.arange(len(GROUPS)), np.arange(len(SAMPLE_TYPES)),
+        np.arange(len(TIMES)), np.arange(len(elements)), indexing="ij"
+    ))
+    number = 60 + shale % 40
+    shale_ids = np.array([f"{60 + i % 40}-{i // 40}" for i in range(n_shales)])
+    groups = np.array(GROUPS)[group]
+    types = np.array(SAMPLE_TYPES)[stype]
+    times = np.array(TIMES, dtype=float)[t]
+    combos = np.char.add(number.astype(str), groups)
+    stamps = np.array([f"t{x:g}" for x in TIMES])[t]
+    sample_ids = pd.Series(combos).str.cat([types, stamps], sep="_") + "_Tot"
+    df = pd.DataFrame({
+        "Unnamed: 0": np.arange(len(shale)),
+        "Sample_ID": sample_ids,
+        "Time": times,
+        "Sample_Type": types,
+        "Group": groups,
+        "Sample_Number": number,
+        "Sample_Combo": combos,
+        "Experiment": "Exp1",
+        "Element": np.array(elements)[element],
+        "Concentration": rng.lognormal(3, 2, len(shale)),
+        "Shale_ID": shale_ids[shale],
+    })
+    return df
+
+
+def synth_raw(scale, seed=0):
+    """Wide instrument export shaped like icpTotRaw.csv."""
+    rng = np.random.default_rng(seed)
+    n = RAW_SHALES_PER_SCALE * scale
+    shale, group, stype, t = (a.ravel() for a in np.meshgrid(
+        np.arange(n), np.arange(len(GROUPS)), np.arange(len(SAMPLE_TYPES)), np.arange(len(TIMES)), indexing="ij"
+    ))
+    ids = [
+        f"{60 + s % 40}{GROUPS[g]}_{SAMPLE_TYPES[d]}_t{TIMES[k]:g}_Tot"
+        for s, g, d, k in zip(shale, group, stype, t)
+    ]
+    columns = [f"{round(m)}{e} (KED_IS)" for e, m in MOLAR_MASSES.items()]
+    values = rng.lognormal(3, 2, (len(ids) + 1, len(columns))).round(3)
+    df = pd.DataFrame(values, columns=columns)
+    df.insert(0, "", ["Blank"] + ids)
+    return df
+
+
+def _time(fn, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_scale(scale, workdir, repeat=3):
+    results = []
+
+    def record(stage, fn, rows, n=repeat):
+        seconds, out = _time(fn, n)
+        results.append({"scale": scale, "stage": stage, "rows": int(rows), "seconds": seconds})
+        return out
+
+    long_path = os.path.join(workdir, f"long_{scale}.csv")
+    raw_path = os.path.join(workdir, f"raw_{scale}.csv")
+    synth_long(scale).to_csv(long_path, index=False)
+    synth_raw(scale).to_csv(raw_path, index=False)
+
+    df = record("csv_load", lambda: pd.read_csv(long_path), 0)
+    results[-1]["rows"] = len(df)
+    df = df.dropna(subset=["Concentration", "Time"])
+    record("unit_conversion", lambda: convert_units(set_units(df.copy(), "ppb"), "mM"), len(df))
+    raw = record("load_experiment", lambda: load_experiment(raw_path, "Exp1"), 0)
+    results[-1]["rows"] = len(raw)
+
+    df = enforce_schema(convert_units(set_units(df, "ppb"), "mM"))
+    data = record("partition", lambda: PartitionedData(df), len(df), n=1)
+    shale = data.shales[len(data.shales) // 2]
+    element = data.elements[shale][0]
+    # Every shale's dropdown, since one lookup is too quick to time on its own
+    record("update_elements", lambda: [element_options(data, s) for s in data.shales], len(df))
+    results[-1]["calls"] = len(data.shales)
+
+    # Figures are timed up to the serialized payload update_plot sends
+    fig = record("update_plot", lambda: to_json_plotly(compact(build_figure(data, shale, element, SAMPLE_TYPES, 14, 10))), len(df))
+    results[-1]["bytes"] = len(fig)
+    fig = record("update_plot_all_elements", lambda: to_json_plotly(compact(build_panel(data, shale, SAMPLE_TYPES, ["x"], 14, 10))), len(df))
+    results[-1]["bytes"] = len(fig)
+    # The /export/data stream, consumed chunk by chunk as the route sends it
+    size = record("download_csv", lambda: sum(map(len, export.stream(data.rows(), "csv.gz"))), len(df), n=1)
+    results[-1]["bytes"] = size
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time load, filter and figure build on synthetic ICP data.")
+    parser.add_argument("--scales", type=int, nargs="+", default=SCALES)
+    parser.add_argument("--repeat", type=int, default=3, help="best-of repeats for the fast stages")
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in args.scales:
+            report["results"].extend(run_scale(scale, workdir, args.repeat))
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
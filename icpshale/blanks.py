@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+# Detection and quantification limits as multiples of the blank standard deviation
+LOD_K = 3
+LOQ_K = 10
+
+# Bits of the Flags column
+BELOW_LOD = 1
+BELOW_LOQ = 2
+NO_LOD = 4  # fewer than two blanks for this run and element
+
+RUN_KEYS = ["Experiment", "Element"]
+
+
+def blank_stats(blanks, keys=RUN_KEYS):
+    """Blank mean, standard deviation, count, LOD and LOQ per run and element.
+
+    Limits are on the blank-corrected scale, i.e. LOD_K and LOQ_K standard
+    deviations above zero.
+    """
+    stats = blanks.groupby(keys, observed=True)["Concentration"].agg(["mean", "std", "count"])
+    stats["lod"] = LOD_K * stats["std"]
+    stats["loq"] = LOQ_K * stats["std"]
+    return stats
+
+
+def apply_blanks(df, stats, keys=RUN_KEYS):
+    """Subtract each row's blank mean and add a uint8 Flags column, in place."""
+    rows = pd.MultiIndex.from_arrays([df[key].to_numpy() for key in keys])
+    idx = stats.index.get_indexer(rows)
+    # Rows without any blank get index -1, which picks the trailing NaN
+    mean, lod, loq = (np.append(stats[col].to_numpy(), np.nan)[idx] for col in ("mean", "lod", "loq"))
+
+    conc = df["Concentration"].to_numpy(dtype=np.float64) - np.nan_to_num(mean)
+    df["Concentration"] = conc.astype(df["Concentration"].dtype)
+    flags = np.where(np.isnan(lod), NO_LOD, 0)
+    with np.errstate(invalid="ignore"):
+        flags |= np.where(conc < lod, BELOW_LOD, 0) | np.where(conc < loq, BELOW_LOQ, 0)
+    df["Flags"] = flags.astype(np.uint8)
+    return df
+
+
+def stats_records(stats):
+    """JSON-friendly form of blank_stats, for frame attrs."""
+    stats = stats.reset_index()
+    return stats.astype(object).where(stats.notna(), None).to_dict("records")
+
+
+def correct(df, blank):
+    """Blank-correct the rows of a long table against its rows where `blank`
+    is True, which are dropped. The blank stats go in attrs["blanks"]."""
+    stats = blank_stats(df[blank])
+    df = apply_blanks(df[~blank].reset_index(drop=True), stats)
+    df.attrs["blanks"] = stats_records(stats)
+    return df
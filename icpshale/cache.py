@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Prepared frames are cached as one .npy file per column so they can be
+# memory-mapped on startup instead of re-parsing the source CSVs.
+CACHE_DIR = os.environ.get("ICP_CACHE_DIR", os.path.join("data", ".cache"))
+CACHE_ENABLED = os.environ.get("ICP_CACHE", "1") != "0"
+CACHE_FORMAT = 3
+
+
+def file_fingerprint(path, known=None):
+    # Trust a previous hash while mtime and size are unchanged
+    st = os.stat(path)
+    if known and known["mtime_ns"] == st.st_mtime_ns and known["size"] == st.st_size:
+        return known
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return {"path": path, "mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha1": h.hexdigest()}
+
+
+def _cache_key(name, fingerprints, version):
+    h = hashlib.sha1(f"{name}:{version}:{CACHE_FORMAT}".encode())
+    for fp in fingerprints:
+        h.update(fp["sha1"].encode())
+    return h.hexdigest()[:16]
+
+
+def read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json(path, obj):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+
+def write_frame(df, target):
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(target), prefix=".build-")
+    columns = []
+    for i, (name, series) in enumerate(df.items()):
+        col = {"name": name, "file": f"c{i}.npy", "dtype": str(series.dtype)}
+        if series.dtype.kind in "biuf" and isinstance(series.dtype, np.dtype):
+            np.save(os.path.join(tmp, col["file"]), series.to_numpy())
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            np.save(os.path.join(tmp, col["file"]), series.cat.codes.to_numpy())
+            col["categories"] = series.cat.categories.tolist()
+        else:
+            codes, uniques = pd.factorize(series)
+            np.save(os.path.join(tmp, col["file"]), codes.astype(np.int32))
+            col["categories"] = list(uniques)
+        columns.append(col)
+    np.save(os.path.join(tmp, "index.npy"), df.index.to_numpy())
+    meta = {"columns": columns, "index_name": df.index.name, "attrs": df.attrs}
+    write_json(os.path.join(tmp, "meta.json"), meta)
+    try:
+        os.rename(tmp, target)
+    except OSError:
+        # Another worker finished the same build first
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def read_frame(target):
+    meta = read_json(os.path.join(target, "meta.json"))
+    data = {}
+    for col in meta["columns"]:
+        values = np.load(os.path.join(target, col["file"]), mmap_mode="r").view(np.ndarray)
+        if "categories" in col:
+            values = pd.Categorical.from_codes(values, categories=col["categories"])
+            if col["dtype"] != "category":
+                values = values.astype(pd.api.types.pandas_dtype(col["dtype"]))
+        data[col["name"]] = values
+    index = np.load(os.path.join(target, "index.npy"), mmap_mode="r").view(np.ndarray)
+    index = pd.Index(index, name=meta["index_name"])
+    df = pd.DataFrame(data, index=index, copy=False)
+    df.attrs.update(meta.get("attrs", {}))
+    return df
+
+
+def cached_frame(name, sources, build, version=1):
+    """Return build() for the given source files, reusing the on-disk cache
+    while none of the sources have changed. Bump version when build changes."""
+    index_path = os.path.join(CACHE_DIR, f"{name}.json")
+    entry = (read_json(index_path) if CACHE_ENABLED else None) or {}
+    known = {fp["path"]: fp for fp in entry.get("sources", [])}
+    fingerprints = [file_fingerprint(path, known.get(path)) for path in sources]
+    key = _cache_key(name, fingerprints, version)
+
+    if CACHE_ENABLED:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        target = os.path.join(CACHE_DIR, f"{name}.{key}")
+        if not os.path.isdir(target):
+            write_frame(build(), target)
+        if entry.get("key") != key or entry.get("sources") != fingerprints:
+            write_json(index_path, {"key": key, "sources": fingerprints})
+            for stale in os.listdir(CACHE_DIR):
+                path = os.path.join(CACHE_DIR, stale)
+                if stale.rpartition(".")[0] == name and path != target and os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+        df = read_frame(target)
+    else:
+        df = build()
+    # Lets downstream caches tell dataset builds apart
+    df.attrs["fingerprint"] = key
+    return df
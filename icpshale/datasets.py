@@ -0,0 +1,180 @@
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+from icpshale.alignment import align_ph_o2, load_ph_o2
+from icpshale.blanks import correct
+from icpshale.cache import cached_frame
+from icpshale.exclusions import ExclusionStore
+from icpshale.ingest import load_combined, watched_paths
+from icpshale.partition import PartitionedData, in_partition_order
+from icpshale.schema import enforce_schema
+from icpshale.units import convert_units, set_units
+
+FULL_PATH = "data/full_cleaned_icp_pho2.csv"
+CLEANED_PATH = "data/cleaned_icp_data.csv"
+PH_O2_PATH = "data/phO2.csv"
+# Seconds between checks of a dataset's source files; 0 turns hot reload off
+RELOAD_INTERVAL = float(os.environ.get("ICP_RELOAD_INTERVAL", 2))
+
+log = logging.getLogger(__name__)
+
+
+# Full table without blanks/rinses, converted to mM
+def load_full_mM():
+    df = pd.read_csv(FULL_PATH)
+    df = df[~df["Sample_ID"].str.contains("BLANK|Rinse", na=False)]
+    df["Concentration"] = pd.to_numeric(df["Concentration"], errors="coerce")
+    df["Time"] = pd.to_numeric(df["Time"], errors="coerce")
+    df = df.dropna(subset=["Concentration", "Time"])
+    set_units(df, "ppb")
+    convert_units(df, "mM")
+    return in_partition_order(enforce_schema(df))
+
+
+# Cleaned data blank-corrected per experiment and element, without blanks/rinses
+def blank_corrected_cleaned():
+    df = pd.read_csv(CLEANED_PATH)
+    df["Concentration"] = pd.to_numeric(df["Concentration"], errors="coerce")
+    sample_id = df["Sample_ID"].astype(str)
+    df = df[~sample_id.str.contains("Rinse")]
+    return correct(df, (sample_id[df.index] == "BLANK").to_numpy())
+
+
+def load_cleaned():
+    return in_partition_order(enforce_schema(blank_corrected_cleaned()))
+
+
+# Cleaned data with the nearest pH/O2 reading joined onto every row
+def load_cleaned_ph_o2():
+    df = blank_corrected_cleaned()
+    # Convert Time to float from Sample_ID
+    df["Time"] = df["Sample_ID"].astype(str).str.extract(r"t(\d+\.?\d*)")[0].astype(float)
+    return in_partition_order(align_ph_o2(enforce_schema(df), load_ph_o2(PH_O2_PATH)))
+
+
+# name -> how to build the frame, the files it is built from (or a function
+# listing them) and whether points can be excluded
+DATASETS = {
+    "full_cleaned_icp_pho2_mM": {
+        "frame": lambda: cached_frame("full_cleaned_icp_pho2_mM", [FULL_PATH], load_full_mM, version=3),
+        "sources": [FULL_PATH],
+        "exclusions": True,
+    },
+    "cleaned_icp_data": {
+        "frame": lambda: cached_frame("cleaned_icp_data", [CLEANED_PATH], load_cleaned, version=4),
+        "sources": [CLEANED_PATH],
+        "exclusions": True,
+    },
+    # Parsed by icpshale.ingest, only re-run for changed exports
+    "combined_raw": {
+        "frame": load_combined,
+        "sources": watched_paths,
+        "exclusions": True,
+    },
+    "cleaned_icp_data_ph_o2": {
+        "frame": lambda: cached_frame("cleaned_icp_data_ph_o2", [CLEANED_PATH, PH_O2_PATH], load_cleaned_ph_o2, version=5),
+        "sources": [CLEANED_PATH, PH_O2_PATH],
+        "exclusions": False,
+    },
+}
+
+
+class Dataset:
+    """A registered dataset as a series of immutable PartitionedData snapshots.
+
+    A background thread polls the source files and, once a change has been
+    stable for one interval, rebuilds through the binary cache (and the
+    incremental ingest for raw exports) and swaps the new snapshot in with a
+    single assignment. Callbacks take one snapshot() up front and use it
+    throughout, so they never see a mix of old and new data.
+    """
+
+    def __init__(self, name, interval=RELOAD_INTERVAL):
+        self.name = name
+        self.spec = DATASETS[name]
+        self.interval = interval
+        self.exclusions = ExclusionStore(name) if self.spec["exclusions"] else None
+        self.version = 0
+        self._stamps = self._stat()
+        self._current = self._build()
+        self._reload_lock = threading.Lock()
+        self._watcher_pid = None
+
+    def _stat(self):
+        stamps = {}
+        sources = self.spec["sources"]
+        for path in sources() if callable(sources) else sources:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                stamps[path] = None
+            else:
+                stamps[path] = (st.st_mtime_ns, st.st_size)
+        return stamps
+
+    def _build(self):
+        return PartitionedData(self.spec["frame"](), self.exclusions)
+
+    def snapshot(self):
+        return self._current
+
+    def watch(self):
+        """Start the watcher thread for this process, if not already running.
+
+        Threads do not survive fork, so this is called per request rather than
+        at load time, which would only start it in the gunicorn master.
+        """
+        if self.interval and self._watcher_pid != os.getpid():
+            self._watcher_pid = os.getpid()
+            threading.Thread(target=self._watch, name=f"reload-{self.name}", daemon=True).start()
+
+    def reload(self, stamps=None):
+        """Rebuild and swap in a new snapshot. Returns the new version."""
+        with self._reload_lock:
+            stamps = stamps or self._stat()
+            data = self._build()
+            self._stamps = stamps
+            self._current = data
+            self.version += 1
+            log.info("reloaded %s (version %d, %d rows)", self.name, self.version, len(data.frame))
+            return self.version
+
+    def _watch(self):
+        pending = failed = None
+        while True:
+            time.sleep(self.interval)
+            stamps = self._stat()
+            if stamps == self._stamps or stamps == failed:
+                pending = None
+                continue
+            # Wait until the files stop changing so a half-written file is not loaded
+            if stamps != pending:
+                pending = stamps
+                continue
+            try:
+                self.reload(stamps)
+            except Exception:
+                log.exception("reloading %s failed, keeping version %d", self.name, self.version)
+                failed = stamps
+            pending = None
+
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def load_dataset(name):
+    """Dataset handle for a registered dataset, built once per process.
+
+    Frames come back memory-mapped read-only from the cache, so loading in
+    the gunicorn master (--preload) lets every forked worker share the pages.
+    """
+    with _lock:
+        dataset = _loaded.get(name)
+        if dataset is None:
+            dataset = _loaded[name] = Dataset(name)
+        return dataset
@@ -0,0 +1,29 @@
+import os
+import sqlite3
+import threading
+
+
+class Connections:
+    """One sqlite3 connection to a database file per thread and process,
+    opened in autocommit WAL mode with its schema applied."""
+
+    def __init__(self, path, schema, row_factory=None):
+        self.path = path
+        self.schema = schema
+        self.row_factory = row_factory
+        self._local = threading.local()
+
+    def get(self):
+        # sqlite3 connections must not cross threads or forked processes
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            if self.row_factory is not None:
+                conn.row_factory = self.row_factory
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.schema)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
@@ -0,0 +1,131 @@
+import ast
+import os
+
+import numpy as np
+import pandas as pd
+
+from icpshale.figcache import Memo
+from icpshale.partition import PartitionedData
+from icpshale.schema import CURVE_KEYS as MEASURED_CURVE_KEYS
+
+# Ratios offered for every shale that has all of their elements; more can be
+# added as semicolon-separated expressions in ICP_DERIVED
+RATIOS = ["Ca/Mg", "(Ca+Mg)/Si", "Sr/Ca", "Fe/Mn"] + [
+    e.strip() for e in os.environ.get("ICP_DERIVED", "").split(";") if e.strip()
+]
+# Curves within a shale's pivot, for t0 normalization
+CURVE_KEYS = [key for key in MEASURED_CURVE_KEYS if key not in ("Shale_ID", "Element")]
+LABEL_COLUMNS = ["Shale_ID", "Sample_ID", "Time", "Sample_Type", "Group", "Sample_Combo"]
+MEMO_SIZE = 32
+
+_OPS = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide}
+
+
+def parse(expression):
+    """Syntax tree of an expression over element names: + - * /, numbers,
+    parentheses and t0(...), the value divided by its curve's first value."""
+    try:
+        tree = ast.parse(expression, mode="eval").body
+    except SyntaxError:
+        raise ValueError(f"Invalid expression: {expression!r}")
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            if not (isinstance(node.func, ast.Name) and node.func.id == "t0" and len(node.args) == 1 and not node.keywords):
+                raise ValueError(f"Only t0(...) may be called in {expression!r}")
+        elif not isinstance(node, (ast.BinOp, ast.UnaryOp, ast.USub, ast.Name, ast.Load, ast.Constant) + tuple(_OPS)):
+            raise ValueError(f"Unsupported syntax in {expression!r}")
+        elif isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"Unsupported constant in {expression!r}")
+    return tree
+
+
+def names(tree):
+    return {node.id for node in ast.walk(tree) if isinstance(node, ast.Name) and node.id != "t0"}
+
+
+def is_derived(element):
+    # Plain element names stay on the partitioned path
+    return isinstance(element, str) and not element.isidentifier()
+
+
+def options(elements):
+    """Derived quantities available for a shale with these elements."""
+    present = set(elements)
+    ratios = [r for r in RATIOS if names(parse(r)) <= present]
+    return ratios + [f"t0({e})" for e in elements if e not in ("pH", "O2")]
+
+
+class Pivot:
+    """Kept rows of one shale with one column per element on a shared
+    (Sample_ID, Time) index, rows in time order. Replicate points at the same
+    index are averaged."""
+
+    def __init__(self, rows):
+        index = pd.MultiIndex.from_arrays([rows["Sample_ID"].to_numpy(), rows["Time"].to_numpy(dtype=np.float64)])
+        row_codes, uniques = pd.factorize(index)
+        col_codes, self.elements = pd.factorize(rows["Element"])
+        values = rows["Concentration"].to_numpy(dtype=np.float64)
+
+        shape = (len(uniques), len(self.elements))
+        cell = row_codes * shape[1] + col_codes
+        finite = ~np.isnan(values)
+        total = np.bincount(cell[finite], weights=values[finite], minlength=shape[0] * shape[1])
+        count = np.bincount(cell[finite], minlength=shape[0] * shape[1])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            matrix = (total / count).reshape(shape)
+
+        # factorize numbers rows by first appearance, so this is each row's first occurrence
+        first = np.unique(row_codes, return_index=True)[1]
+        labels = rows[[c for c in LABEL_COLUMNS if c in rows.columns]].iloc[first].reset_index(drop=True)
+        order = np.argsort(labels["Time"].to_numpy(dtype=np.float64), kind="stable")
+        self.labels = labels.iloc[order].reset_index(drop=True)
+        self.matrix = matrix[order]
+        self.curves = self.labels.groupby(CURVE_KEYS, observed=True, sort=False).ngroup().to_numpy()
+
+    def column(self, element):
+        try:
+            return self.matrix[:, self.elements.get_loc(element)]
+        except KeyError:
+            return np.full(len(self.matrix), np.nan)
+
+    def evaluate(self, tree):
+        if isinstance(tree, ast.Name):
+            return self.column(tree.id)
+        if isinstance(tree, ast.Constant):
+            return np.full(len(self.matrix), float(tree.value))
+        if isinstance(tree, ast.UnaryOp):
+            return -self.evaluate(tree.operand)
+        if isinstance(tree, ast.Call):
+            values = self.evaluate(tree.args[0])
+            # Rows are in time order, so "first" is each curve's earliest finite value
+            start = pd.Series(values).groupby(self.curves).transform("first").to_numpy()
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return values / start
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return _OPS[type(tree.op)](self.evaluate(tree.left), self.evaluate(tree.right))
+
+
+_memo = Memo(MEMO_SIZE)
+
+
+def pivot(data, shale):
+    """Pivot of a shale's kept rows, memoized on the dataset and exclusion version."""
+    return _memo.get_or_build(data.version() + ("pivot", shale), lambda: Pivot(data.rows(shale)))
+
+
+def view(data, shale, expression):
+    """PartitionedData holding one derived quantity of a shale under Element
+    = expression, so the figure builders, fits and aggregates read it like an
+    ordinary element. Memoized on the dataset and exclusion version."""
+    tree = parse(expression)
+    key = data.version() + ("view", shale, expression)
+
+    def build():
+        table = pivot(data, shale)
+        values = table.evaluate(tree)
+        keep = np.isfinite(values)
+        frame = table.labels[keep].assign(Element=expression, Concentration=values[keep])
+        # Ratios and t0-normalised series have no unit, so none is inherited
+        frame.attrs = {"fingerprint": ":".join(map(str, key))}
+        return PartitionedData(frame)
+    return _memo.get_or_build(key, build)
@@ -0,0 +1,77 @@
+import numpy as np
+
+# Roughly one point per horizontal pixel of a typical plot
+MAX_TRACE_POINTS = 1500
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets indices for x-sorted, finite data."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    counts = np.diff(edges)
+    # Mean of each bucket, computed for all buckets at once
+    mean_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+    next_x = np.r_[mean_x[1:], x[-1]]
+    next_y = np.r_[mean_y[1:], y[-1]]
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - next_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax(x, y, n_out):
+    """Indices of the minimum and maximum of each of n_out / 2 equal buckets."""
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    buckets = max(n_out // 2, 1)
+    bucket = np.arange(n) * buckets // n
+    order = np.lexsort((y, bucket))
+    starts = np.searchsorted(bucket[order], np.arange(buckets))
+    ends = np.r_[starts[1:], n] - 1
+    return np.unique(np.r_[order[starts], order[ends], 0, n - 1])
+
+
+def downsample(x, y, max_points=MAX_TRACE_POINTS, method="lttb"):
+    """Sorted row positions to draw for one trace. The first, last, minimum
+    and maximum points are always kept."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    finite = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+    if len(finite) <= max_points:
+        return np.arange(len(x))
+    finite = finite[np.argsort(x[finite], kind="stable")]
+    fx, fy = x[finite], y[finite]
+    picked = (lttb if method == "lttb" else minmax)(fx, fy, max_points)
+    picked = np.r_[picked, np.argmin(fy), np.argmax(fy)]
+    return np.sort(finite[np.unique(picked)])
+
+
+def reduce_trace(df, max_points=MAX_TRACE_POINTS, x_range=None, x="Time", y="Concentration", method="lttb"):
+    """Rows of one trace limited to x_range and downsampled to max_points."""
+    if x_range is not None:
+        t = df[x].to_numpy()
+        df = df[(t >= x_range[0]) & (t <= x_range[1])]
+    if max_points and len(df) > max_points:
+        df = df.iloc[downsample(df[x].to_numpy(), df[y].to_numpy(dtype=float), max_points, method)]
+    return df
+
+
+def zoom_range(relayout):
+    """x range from a dcc.Graph relayoutData event, or None."""
+    if not relayout:
+        return None
+    if "xaxis.range[0]" in relayout:
+        return float(relayout["xaxis.range[0]"]), float(relayout["xaxis.range[1]"])
+    if "xaxis.range" in relayout:
+        return tuple(float(v) for v in relayout["xaxis.range"])
+    return None
@@ -0,0 +1,118 @@
+import os
+
+import pandas as pd
+
+from icpshale.db import Connections
+
+DB_PATH = os.environ.get("ICP_EXCLUSIONS_DB", os.path.join("data", ".cache", "exclusions.sqlite"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS exclusions (
+    dataset TEXT NOT NULL,
+    element TEXT NOT NULL,
+    sample_id TEXT NOT NULL,
+    time REAL NOT NULL,
+    PRIMARY KEY (dataset, element, sample_id, time)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS versions (
+    dataset TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS element_versions (
+    dataset TEXT NOT NULL,
+    element TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (dataset, element)
+) WITHOUT ROWID;
+"""
+
+
+class ExclusionStore:
+    """Points removed by click-to-remove, kept as (Sample_ID, Time, Element)
+    tombstones in SQLite so every gunicorn worker and thread sees the same
+    state. Each change bumps the dataset's version and that of every element
+    it touched."""
+
+    def __init__(self, dataset, path=DB_PATH):
+        self.dataset = dataset
+        self.path = path
+        self._conn = Connections(path, SCHEMA).get
+
+    def _bump(self, conn, elements):
+        conn.execute(
+            "INSERT INTO versions VALUES (?, 1) "
+            "ON CONFLICT(dataset) DO UPDATE SET version = version + 1",
+            (self.dataset,),
+        )
+        conn.executemany(
+            "INSERT INTO element_versions VALUES (?, ?, 1) "
+            "ON CONFLICT(dataset, element) DO UPDATE SET version = version + 1",
+            [(self.dataset, element) for element in elements],
+        )
+
+    def version(self, element=None):
+        if element is None:
+            query, params = "SELECT version FROM versions WHERE dataset = ?", (self.dataset,)
+        else:
+            query = "SELECT version FROM element_versions WHERE dataset = ? AND element = ?"
+            params = (self.dataset, element)
+        row = self._conn().execute(query, params).fetchone()
+        return row[0] if row else 0
+
+    def add(self, element, sample_id, time):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO exclusions VALUES (?, ?, ?, ?)",
+                (self.dataset, element, sample_id, float(time)),
+            )
+            if cur.rowcount:
+                self._bump(conn, [element])
+        return self.version()
+
+    def add_many(self, rows):
+        """Add (element, sample_id, time) tombstones in one transaction.
+        Returns how many were new."""
+        rows = [(self.dataset, element, sample_id, float(time)) for element, sample_id, time in rows]
+        if not rows:
+            return 0
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO exclusions VALUES (?, ?, ?, ?)", rows)
+            added = conn.total_changes - before
+            if added:
+                self._bump(conn, sorted({row[1] for row in rows}))
+        return added
+
+    def clear(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            elements = [row[0] for row in conn.execute(
+                "SELECT DISTINCT element FROM exclusions WHERE dataset = ?", (self.dataset,)
+            )]
+            conn.execute("DELETE FROM exclusions WHERE dataset = ?", (self.dataset,))
+            self._bump(conn, elements)
+        return self.version()
+
+    def excluded(self, element=None):
+        """Tombstones as a DataFrame of Element, Sample_ID and Time."""
+        query = "SELECT element, sample_id, time FROM exclusions WHERE dataset = ?"
+        params = (self.dataset,)
+        if element is not None:
+            query += " AND element = ?"
+            params += (element,)
+        rows = self._conn().execute(query, params).fetchall()
+        return pd.DataFrame(rows, columns=["Element", "Sample_ID", "Time"])
+
+    def mask(self, rows, element=None):
+        """Boolean array marking which of `rows` have been excluded."""
+        tombs = self.excluded(element)
+        if tombs.empty:
+            return None
+        keys = ["Sample_ID", "Time"] if element is not None else ["Element", "Sample_ID", "Time"]
+        index = pd.MultiIndex.from_frame(rows[keys].astype({"Time": float}))
+        return index.isin(pd.MultiIndex.from_frame(tombs[keys]))
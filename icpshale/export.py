@@ -0,0 +1,127 @@
+import os
+import zlib
+from urllib.parse import urlencode
+
+import flask
+
+from icpshale import metrics
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = pq = None
+
+CHUNK_ROWS = int(os.environ.get("ICP_EXPORT_CHUNK_ROWS", 50_000))
+
+FORMATS = {
+    "csv": ("text/csv", ".csv"),
+    "csv.gz": ("application/gzip", ".csv.gz"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+}
+
+
+def available_formats():
+    return [fmt for fmt in FORMATS if fmt != "parquet" or pq is not None]
+
+
+def iter_csv(frame, chunk_rows=CHUNK_ROWS, compress=False, index=True):
+    """CSV of `frame` as a stream of byte chunks, gzip-compressed if asked."""
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    for start in range(0, max(len(frame), 1), chunk_rows):
+        chunk = frame.iloc[start:start + chunk_rows].to_csv(header=start == 0, index=index).encode()
+        chunk = gz.compress(chunk) if gz else chunk
+        if chunk:
+            yield chunk
+    if gz:
+        yield gz.flush()
+
+
+class _Sink:
+    """Write-only file object the Parquet writer fills between yields."""
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def iter_parquet(frame, chunk_rows=CHUNK_ROWS):
+    """Parquet file of `frame` streamed one row group per chunk."""
+    if pq is None:
+        raise RuntimeError("Parquet export needs pyarrow")
+    # Categorical dictionaries differ between chunks, so write their values
+    categories = {col: str for col, dtype in frame.dtypes.items() if dtype == "category"}
+    sink = _Sink()
+    schema = pa.Schema.from_pandas(frame.iloc[:0].astype(categories))
+    with pq.ParquetWriter(sink, schema) as writer:
+        for start in range(0, len(frame), chunk_rows):
+            chunk = frame.iloc[start:start + chunk_rows].astype(categories)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream(frame, fmt, chunk_rows=CHUNK_ROWS, index=True):
+    if fmt == "parquet":
+        return iter_parquet(frame, chunk_rows)
+    return iter_csv(frame, chunk_rows, compress=fmt == "csv.gz", index=index)
+
+
+def export_url(fmt, shale=None, element=None, sample_types=None):
+    params = [("format", fmt)] + [(k, v) for k, v in (("shale", shale), ("element", element)) if v]
+    return "/export/data?" + urlencode(params + [("sample_type", t) for t in sample_types or []])
+
+
+def register(server, dataset):
+    """Add /export/data and /export/exclusions routes for a Dataset.
+
+    /export/data takes format (csv, csv.gz, parquet) and optional shale,
+    element and sample_type filters; without filters it is the whole kept
+    dataset. Rows are streamed in CHUNK_ROWS chunks.
+    """
+    def respond(chunks, name, fmt):
+        mimetype, ext = FORMATS[fmt]
+        return flask.Response(
+            flask.stream_with_context(chunks), mimetype=mimetype,
+            headers={"Content-Disposition": f'attachment; filename="{name}{ext}"'}
+        )
+
+    def requested_format():
+        fmt = flask.request.args.get("format", "csv.gz")
+        if fmt not in available_formats():
+            flask.abort(400, f"format must be one of {', '.join(available_formats())}")
+        return fmt
+
+    @server.route("/export/data")
+    @metrics.instrument("export_data")
+    def export_data():
+        args = flask.request.args
+        fmt = requested_format()
+        shale, element = args.get("shale") or None, args.get("element") or None
+        frame = dataset.snapshot().rows(shale, element, args.getlist("sample_type") or None)
+        name = "_".join([dataset.name] + [v for v in (shale, element) if v])
+        return respond(stream(frame, fmt), name, fmt)
+
+    @server.route("/export/exclusions")
+    @metrics.instrument("export_exclusions")
+    def export_exclusions():
+        fmt = requested_format()
+        if dataset.exclusions is None:
+            flask.abort(404)
+        excluded = dataset.exclusions.excluded()
+        metrics.count(rows_returned=len(excluded))
+        return respond(stream(excluded, fmt, index=False), f"{dataset.name}_exclusions", fmt)
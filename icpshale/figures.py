@@ -0,0 +1,276 @@
+import base64
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.subplots import make_subplots
+
+from icpshale.derived import is_derived
+from icpshale.downsample import reduce_trace
+from icpshale.kinetics import model_curve
+from icpshale.schema import CO2_GROUPS, OXYGEN_GROUPS
+from icpshale.units import get_units
+
+# Sample_Combo colors of the raw-export view
+RAW_COLORS = {
+    "63A": "#8B0000", "67A": "#8B0000", "60A": "#8B0000", "64A": "#8B0000",
+    "63D": "#FF6347", "67D": "#FF6347", "60D": "#FF6347", "64D": "#FF6347",
+    "63B": "#00008B", "67B": "#00008B", "60B": "#00008B", "64B": "#00008B",
+    "63C": "#4682B4", "67C": "#4682B4", "60C": "#4682B4", "64C": "#4682B4"
+}
+
+
+def no_data():
+    return px.scatter(title="No data available for this selection.")
+
+
+def axis_label(element, unit=None):
+    if element == "pH" or is_derived(element):
+        return element
+    if not unit:
+        return f"{element} Concentration"
+    elif element == "O2":
+        return f"O₂ ({unit})"
+    return f"{element} ({unit})"
+
+
+def condition_style(group):
+    color = "#FF0000" if group in OXYGEN_GROUPS else "#0000FF"
+    return color, "solid" if group in CO2_GROUPS else "dash"
+
+
+def build_figure(data, shale_id, element, sample_type, font_size, point_size, max_points=None, x_range=None, overlay="", fits=None):
+    combos = data.combos(shale_id, element, sample_type)
+    if not combos:
+        return no_data()
+
+    fig = go.Figure()
+    for combo, subset in combos:
+        subset = reduce_trace(subset, max_points, x_range)
+        if subset.empty:
+            continue
+        color, dash = condition_style(subset["Group"].iloc[0])
+        fig.add_trace(go.Scatter(
+            x=subset["Time"], y=subset["Concentration"],
+            mode="lines+markers",
+            marker=dict(size=point_size, color=color),
+            line=dict(dash=dash, color=color),
+            name=combo,
+            text=subset["Sample_ID"]
+        ))
+        # Plateau-model fits from icpshale.kinetics, one per sample type of the combo
+        for stype, rows in (subset.groupby("Sample_Type", observed=True) if fits is not None else []):
+            if (combo, stype) not in fits.index or not np.isfinite(fits.at[(combo, stype), "plateau"]):
+                continue
+            t = np.linspace(0, float(rows["Time"].max()), 60)
+            fig.add_trace(go.Scatter(
+                x=t, y=model_curve(fits.loc[(combo, stype)], t),
+                mode="lines", line=dict(dash="dot", width=1, color=color),
+                name=f"{combo} {stype} fit", showlegend=False, hoverinfo="skip"
+            ))
+        if overlay and subset[f"Aligned_{overlay}"].notna().any():
+            fig.add_trace(go.Scatter(
+                x=subset["Time"], y=subset[f"Aligned_{overlay}"],
+                mode="lines+markers", yaxis="y2",
+                marker=dict(size=point_size, color=color, symbol="diamond-open"),
+                line=dict(dash="dot", color=color),
+                name=f"{combo} {overlay}",
+                text=subset["Sample_ID"]
+            ))
+
+    if overlay:
+        fig.update_layout(yaxis2=dict(
+            title="pH" if overlay == "pH" else "O₂", overlaying="y", side="right", showgrid=False
+        ))
+
+    fig.update_layout(
+        title=f"Shale {shale_id}: [{element}]",
+        title_font_size=font_size + 4,
+        font=dict(size=font_size),
+        xaxis_title="Time (days)",
+        yaxis_title=axis_label(element, get_units(data.frame)),
+        xaxis=dict(showgrid=False, rangemode="tozero"),
+        yaxis=dict(showgrid=False, rangemode="tozero"),
+        plot_bgcolor="rgba(0,0,0,0)",
+        paper_bgcolor="rgba(0,0,0,0)",
+        uirevision=f"{shale_id}:{element}"
+    )
+    if x_range is not None:
+        fig.update_layout(xaxis_range=list(x_range))
+    return fig
+
+
+# Points flagged by icpshale.outliers, drawn as rings over the plotted series.
+# meta.ring tells the client-side restyle to keep the rings this much larger.
+RING_OFFSET = 8
+
+
+def add_flagged(fig, flagged, point_size):
+    if flagged.empty:
+        return fig
+    fig.add_trace(go.Scatter(
+        x=flagged["Time"], y=flagged["Concentration"], mode="markers",
+        marker=dict(size=point_size + RING_OFFSET, color="#000000", symbol="circle-open", line=dict(width=2)),
+        name=f"Flagged ({len(flagged)})", text=flagged["Sample_ID"], meta={"ring": RING_OFFSET}
+    ))
+    return fig
+
+
+# Replicate mean with a shaded SD or SE band per (Group, Sample_Type)
+def build_band_figure(agg, shale_id, element, sample_type, font_size, point_size, band="std", unit=None):
+    rows = agg.series(shale_id, element, sample_type)
+    if rows.empty:
+        return no_data()
+
+    fig = go.Figure()
+    for (group, stype), series in rows.groupby(["Group", "Sample_Type"], observed=True, sort=True):
+        color, dash = condition_style(group)
+        t, mean = series["Time"].to_numpy(), series["mean"].to_numpy()
+        spread = np.nan_to_num(series[band].to_numpy())
+        name = f"{group} {stype}"
+        fig.add_trace(go.Scatter(
+            x=np.r_[t, t[::-1]], y=np.r_[mean + spread, (mean - spread)[::-1]],
+            fill="toself", fillcolor=color, opacity=0.2, line=dict(width=0),
+            name=name, legendgroup=name, showlegend=False, hoverinfo="skip"
+        ))
+        fig.add_trace(go.Scatter(
+            x=t, y=mean, mode="lines+markers",
+            marker=dict(size=point_size, color=color, symbol="circle" if stype == "Disk" else "square"),
+            line=dict(dash=dash, color=color),
+            name=name, legendgroup=name,
+            customdata=np.c_[series["n"].to_numpy(), spread],
+            hovertemplate="%{y:.4g} ± %{customdata[1]:.2g} (n=%{customdata[0]})<extra>%{fullData.name}</extra>"
+        ))
+
+    fig.update_layout(
+        title=f"Shale {shale_id}: [{element}] mean ± {'SD' if band == 'std' else 'SE'}",
+        title_font_size=font_size + 4,
+        font=dict(size=font_size),
+        xaxis_title="Time (days)",
+        yaxis_title=axis_label(element, unit),
+        xaxis=dict(showgrid=False, rangemode="tozero"),
+        yaxis=dict(showgrid=False, rangemode="tozero"),
+        plot_bgcolor="rgba(0,0,0,0)",
+        paper_bgcolor="rgba(0,0,0,0)",
+        uirevision=f"{shale_id}:{element}"
+    )
+    return fig
+
+
+# One WebGL subplot per element of a shale, built from a single pass over its rows
+def build_panel(data, shale_id, sample_type, shared_axes, font_size, point_size, max_points=None, cols=4):
+    panel = data.shale_combos(shale_id, sample_type)
+    if not panel:
+        return no_data()
+
+    rows = -(-len(panel) // cols)
+    fig = make_subplots(
+        rows=rows, cols=cols, subplot_titles=[element for element, _ in panel],
+        shared_xaxes="all" if "x" in shared_axes else False,
+        shared_yaxes="all" if "y" in shared_axes else False,
+        horizontal_spacing=0.05, vertical_spacing=0.3 / rows
+    )
+    shown = set()
+    for i, (element, combos) in enumerate(panel):
+        for combo, subset in combos:
+            subset = reduce_trace(subset, max_points)
+            color, dash = condition_style(subset["Group"].iloc[0])
+            fig.add_trace(go.Scattergl(
+                x=subset["Time"], y=subset["Concentration"],
+                mode="lines+markers",
+                marker=dict(size=point_size, color=color),
+                line=dict(dash=dash, color=color),
+                name=combo, legendgroup=combo, showlegend=combo not in shown,
+                text=subset["Sample_ID"], customdata=[element] * len(subset), meta=element
+            ), row=i // cols + 1, col=i % cols + 1)
+            shown.add(combo)
+
+    unit = get_units(data.frame)
+    fig.update_xaxes(showgrid=False, rangemode="tozero")
+    fig.update_yaxes(showgrid=False, rangemode="tozero")
+    fig.update_layout(
+        title=f"Shale {shale_id}: all elements" + (f" ({unit})" if unit else ""),
+        title_font_size=font_size + 4,
+        font=dict(size=font_size),
+        height=260 * rows,
+        plot_bgcolor="rgba(0,0,0,0)",
+        paper_bgcolor="rgba(0,0,0,0)"
+    )
+    return fig
+
+
+# Raw-export view: one color per Sample_Combo, one symbol per Sample_Type
+def build_raw_figure(data, shale_id, element, sample_type, font_size, point_size):
+    dff = data.select(shale_id, element, sample_type)
+    if dff.empty:
+        return no_data()
+
+    fig = px.scatter(
+        dff, x="Time", y="Concentration", color="Sample_Combo", symbol="Sample_Type",
+        color_discrete_map=RAW_COLORS, title=f"Shale {shale_id}: [{element}]",
+        text="Sample_ID"
+    )
+    fig.update_traces(mode="lines+markers", marker=dict(size=point_size))
+    fig.update_layout(
+        title_font_size=font_size + 4,
+        xaxis_title="Time (days)",
+        yaxis_title=axis_label(element),
+        font=dict(size=font_size),
+        xaxis=dict(showgrid=False, rangemode="tozero"),
+        yaxis=dict(showgrid=False, rangemode="tozero")
+    )
+    return fig
+
+
+_templates = {}
+
+
+def _template(types):
+    # Trace defaults only for the trace types a figure uses
+    key = frozenset(types)
+    if key not in _templates:
+        full = pio.templates[pio.templates.default].to_plotly_json()
+        _templates[key] = {"layout": full["layout"], "data": {t: v for t, v in full["data"].items() if t in key}}
+    return _templates[key]
+
+
+def _typed(values):
+    """Plotly's base64 typed-array form of a numeric array, float64 narrowed
+    to float32 when that round trip is exact; None for anything else."""
+    if not isinstance(values, np.ndarray) or values.dtype.kind not in "iuf":
+        return None
+    if values.dtype == np.float64:
+        narrow = values.astype(np.float32)
+        if np.array_equal(narrow, values, equal_nan=True):
+            values = narrow
+    return {"dtype": values.dtype.str[1:], "bdata": base64.b64encode(np.ascontiguousarray(values)).decode()}
+
+
+# Wire form of a figure for update_plot. Numeric arrays go out as base64 typed
+# arrays; hover text is sent once per figure in layout.meta.labels and each
+# trace carries integer codes into it as customdata. icp.expand in
+# assets/restyle.js restores text (and panel customdata from trace meta) in
+# the browser, so what plotly.js draws and what clicks report are unchanged.
+def compact(fig):
+    if isinstance(fig, dict):
+        return fig
+    labels, encoded, arrays = {}, [], []
+    for i, trace in enumerate(fig.data):
+        arrays.append({attr: _typed(trace[attr]) for attr in ("x", "y")})
+        text = trace.text
+        if text is None or isinstance(text, str) or (trace.customdata is not None and trace.meta is None):
+            continue
+        codes, uniques = pd.factorize(np.asarray(text, dtype=object), use_na_sentinel=False)
+        index = np.array([labels.setdefault(label, len(labels)) for label in uniques])
+        trace.text = None
+        arrays[i]["customdata"] = _typed(index[codes].astype(np.min_scalar_type(len(labels))))
+        encoded.append(i)
+    out = fig.to_plotly_json()
+    for trace, typed in zip(out["data"], arrays):
+        trace.update((attr, value) for attr, value in typed.items() if value is not None)
+    out["layout"]["template"] = _template(trace.type for trace in fig.data)
+    if encoded:
+        out["layout"]["meta"] = {"labels": list(labels), "encoded": encoded}
+    return out
@@ -0,0 +1,181 @@
+import argparse
+import contextlib
+import fcntl
+import hashlib
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from icpshale.blanks import correct
+from icpshale.cache import CACHE_DIR, CACHE_FORMAT, file_fingerprint, read_frame, read_json, write_frame, write_json
+from icpshale.partition import in_partition_order
+from icpshale.schema import enforce_schema
+from icpshale.units import convert_units, set_units
+
+INGEST_DIR = os.path.join(CACHE_DIR, "ingest")
+MANIFEST_PATH = os.path.join(INGEST_DIR, "manifest.json")
+# Held while ingesting, so workers and the CLI never sweep each other's frames
+LOCK_PATH = os.path.join(INGEST_DIR, ".lock")
+# Bump when load_experiment's output changes so cached per-export frames are rebuilt
+INGEST_VERSION = 4
+
+# Raw instrument exports: wide tables with one row per sample, one column per element
+RAW_EXPORTS = [
+    {"path": "data/icpTotRaw.csv", "label": "Exp1", "units": "ppb"},
+    # Exp2 was exported in ppm, the other runs in ppb
+    {"path": "data/Exp2_TotICP.csv", "label": "Exp2", "units": "ppm"},
+    {"path": "data/exBis12TotIcp.csv", "label": "BIS", "units": "ppb"},
+]
+
+
+def registered_exports():
+    """Raw exports registered in the manifest, or the built-in ones."""
+    return (read_json(MANIFEST_PATH) or {}).get("exports") or RAW_EXPORTS
+
+
+def watched_paths():
+    # The manifest too, so exports registered by the CLI trigger a reload
+    return [MANIFEST_PATH] + [export["path"] for export in registered_exports()]
+
+
+ID_VARS = ["Sample_ID", "Time", "Sample_Type", "Group", "Sample_Number", "Sample_Combo", "Experiment"]
+
+
+def load_experiment(path, label, units="ppb"):
+    """Long table of one raw export in ppb. Blank rows are kept with
+    Sample_Type "Blank" for the blank-correction stage of ingest()."""
+    df = pd.read_csv(path)
+    df = df[df.iloc[:, 0].notna()].copy()
+    df.rename(columns={df.columns[0]: "Sample_ID"}, inplace=True)
+    df["Sample_ID"] = df["Sample_ID"].astype(str)
+    df["Time"] = df["Sample_ID"].str.extract(r"t([0-9.]+)", expand=False).astype(float)
+    lower = df["Sample_ID"].str.lower()
+    sample_type = np.select([lower == "blank", lower.str.contains("disk"), lower.str.contains("dust")], ["Blank", "Disk", "Dust"], None)
+    df["Sample_Type"] = pd.Series(sample_type, index=df.index, dtype=df["Sample_ID"].dtype)
+    df[["Sample_Number", "Group"]] = df["Sample_ID"].str.extract(r"(\d{2})([A-D])")
+    df["Sample_Combo"] = df["Sample_Number"] + df["Group"]
+    df["Experiment"] = label
+    value_vars = [col for col in df.columns if col not in ID_VARS]
+    df_long = df.melt(id_vars=ID_VARS, value_vars=value_vars, var_name="Element", value_name="Concentration")
+    df_long.dropna(subset=["Concentration"], inplace=True)
+    df_long["Element"] = df_long["Element"].str.extract(r"^\d*([A-Z][a-z]?)", expand=False)
+    df_long["Shale_ID"] = df_long["Sample_Number"] + ("-BIS" if label == "BIS" else "")
+    set_units(df_long, units)
+    return convert_units(df_long, "ppb")
+
+
+def _ingest_one(export, fingerprint):
+    target = os.path.join(INGEST_DIR, f"{export['label']}.v{INGEST_VERSION}.{fingerprint['sha1'][:16]}")
+    if not os.path.isdir(target):
+        write_frame(load_experiment(export["path"], export["label"], export["units"]), target)
+    return target
+
+
+def _combined_key(entries):
+    h = hashlib.sha1(f"format:{CACHE_FORMAT}:{INGEST_VERSION}".encode())
+    for entry in entries:
+        h.update(f"{entry['label']}:{entry['units']}:{entry['sha1']}".encode())
+    return h.hexdigest()[:16]
+
+
+@contextlib.contextmanager
+def _locked():
+    os.makedirs(INGEST_DIR, exist_ok=True)
+    with open(LOCK_PATH, "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def ingest(exports=None, workers=None, force=False):
+    """Parse new or changed raw exports in a process pool and write the
+    combined long table. Returns the directory of the combined frame."""
+    with _locked():
+        return _ingest(exports, workers, force)
+
+
+def _ingest(exports, workers, force):
+    manifest = read_json(MANIFEST_PATH) or {}
+    exports = exports or manifest.get("exports") or RAW_EXPORTS
+    known = {entry["path"]: entry for entry in manifest.get("files", [])}
+
+    entries, pending = [], []
+    for export in exports:
+        old = known.get(export["path"])
+        fingerprint = file_fingerprint(export["path"], old)
+        entry = {**export, **{k: fingerprint[k] for k in ("mtime_ns", "size", "sha1")}, "version": INGEST_VERSION}
+        same = old is not None and all(old.get(k) == entry[k] for k in ("sha1", "label", "units", "version"))
+        if same and not force and os.path.isdir(old["frame"]):
+            entry["frame"] = old["frame"]
+        else:
+            pending.append(len(entries))
+            if force and old is not None:
+                shutil.rmtree(old["frame"], ignore_errors=True)
+        entries.append(entry)
+
+    if len(pending) == 1:
+        i = pending[0]
+        entries[i]["frame"] = _ingest_one(exports[i], entries[i])
+    elif pending:
+        with ProcessPoolExecutor(max_workers=workers or min(len(pending), os.cpu_count() or 1)) as pool:
+            targets = pool.map(_ingest_one, [exports[i] for i in pending], [entries[i] for i in pending])
+            for i, target in zip(pending, targets):
+                entries[i]["frame"] = target
+
+    combined = os.path.join(INGEST_DIR, f"combined.{_combined_key(entries)}")
+    if not os.path.isdir(combined):
+        df = pd.concat([read_frame(entry["frame"]) for entry in entries], ignore_index=True)
+        # Blank-correct every export against its own blanks, then drop them
+        df = correct(df, (df["Sample_Type"] == "Blank").to_numpy())
+        write_frame(in_partition_order(enforce_schema(set_units(df, "ppb"))), combined)
+
+    # Rewritten only on change, since the dataset watcher reloads on its mtime
+    new_manifest = {"exports": exports, "files": entries, "combined": combined}
+    if new_manifest != manifest:
+        write_json(MANIFEST_PATH, new_manifest)
+    live = {combined} | {entry["frame"] for entry in entries}
+    for name in os.listdir(INGEST_DIR):
+        path = os.path.join(INGEST_DIR, name)
+        # .build-* are frames still being written by write_frame
+        if os.path.isdir(path) and path not in live and not name.startswith(".build-"):
+            shutil.rmtree(path, ignore_errors=True)
+    return combined
+
+
+def load_combined():
+    """Combined long table of all registered raw exports, re-ingesting only
+    the files that changed since the last run."""
+    # Mapped under the lock; a later sweep can unlink the files but not the mappings
+    with _locked():
+        combined = _ingest(None, None, False)
+        df = read_frame(combined)
+    df.attrs["fingerprint"] = os.path.basename(combined).rpartition(".")[2]
+    return df
+
+
+def _parse_export(spec):
+    path, _, rest = spec.partition(":")
+    label, _, units = rest.partition(":")
+    return {"path": path, "label": label or os.path.splitext(os.path.basename(path))[0], "units": units or "ppb"}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest raw ICP exports into the cleaned long-table store.")
+    parser.add_argument("exports", nargs="*", metavar="PATH[:LABEL[:UNITS]]",
+                        help="raw export to register in addition to those already in the manifest")
+    parser.add_argument("--workers", type=int, help="size of the process pool")
+    parser.add_argument("--force", action="store_true", help="re-parse every export")
+    args = parser.parse_args(argv)
+
+    exports = list(registered_exports())
+    for export in map(_parse_export, args.exports):
+        exports = [e for e in exports if e["path"] != export["path"]] + [export]
+    combined = ingest(exports, workers=args.workers, force=args.force)
+    df = read_frame(combined)
+    print(f"{len(df)} rows from {len(exports)} exports -> {combined}")
+
+
+if __name__ == "__main__":
+    main()
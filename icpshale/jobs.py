@@ -0,0 +1,302 @@
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import flask
+import pandas as pd
+
+from icpshale import export, kinetics
+from icpshale.datasets import load_dataset
+from icpshale.db import Connections
+
+DB_PATH = os.environ.get("ICP_JOBS_DB", os.path.join("data", ".cache", "jobs.sqlite"))
+JOB_DIR = os.environ.get("ICP_JOB_DIR", os.path.join("data", ".cache", "jobs"))
+# Jobs running at once across every worker process of the host
+CONCURRENCY = int(os.environ.get("ICP_JOB_CONCURRENCY", 1))
+# Finished jobs and their files are dropped after this many seconds
+TTL = float(os.environ.get("ICP_JOB_TTL", 24 * 3600))
+POLL_SECONDS = 0.5
+# Job processes run at lower CPU priority than the workers serving plots
+NICE = 10
+# Job processes are started by a fork server rather than forked from a worker,
+# whose reload, warm-up and dispatcher threads may hold locks at that moment
+CONTEXT = multiprocessing.get_context("forkserver")
+CONTEXT.set_forkserver_preload(["icpshale.jobs"])
+
+ACTIVE = ("queued", "running", "cancelling")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    dataset TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    state TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    pid INTEGER,
+    created REAL NOT NULL,
+    finished REAL
+);
+"""
+
+log = logging.getLogger(__name__)
+
+
+class Cancelled(Exception):
+    pass
+
+
+def run_export(data, params, path, progress):
+    """The kept rows of a selection (or everything) in an export format."""
+    shale, element = params.get("shale"), params.get("element")
+    frame = data.rows(shale, element, params.get("sample_types"))
+    chunks = max(-(-len(frame) // export.CHUNK_ROWS), 1)
+    with open(path, "wb") as f:
+        for i, chunk in enumerate(export.stream(frame, params["format"])):
+            f.write(chunk)
+            progress(min(i + 1, chunks) / chunks, f"{min((i + 1) * export.CHUNK_ROWS, len(frame))} of {len(frame)} rows")
+    mimetype, ext = export.FORMATS[params["format"]]
+    return "_".join(["export"] + [v for v in (shale, element) if v]) + ext, mimetype
+
+
+def run_fits(data, params, path, progress):
+    """Kinetic fits of every curve, one batch of groups at a time."""
+    labels, X, Y, M = kinetics.padded_groups(data.rows(sample_types=params.get("sample_types")))
+    parts = []
+    for i in range(0, max(len(X), 1), kinetics.BATCH_GROUPS):
+        parts.append(kinetics.fit_padded(X[i:i + kinetics.BATCH_GROUPS], Y[i:i + kinetics.BATCH_GROUPS], M[i:i + kinetics.BATCH_GROUPS]))
+        progress(min(i + kinetics.BATCH_GROUPS, len(X)) / max(len(X), 1), f"{min(i + kinetics.BATCH_GROUPS, len(X))} of {len(X)} curves")
+    fits = pd.concat([labels, pd.concat(parts, ignore_index=True)], axis=1)[kinetics.FIT_COLUMNS]
+    fits.to_csv(path, index=False)
+    return "kinetic_fits.csv", "text/csv"
+
+
+# kind -> (label, run(data, params, path, progress) -> (download name, mimetype))
+KINDS = {
+    "export": ("Export", run_export),
+    "fits": ("Batch kinetic fits", run_fits),
+}
+
+
+class JobQueue:
+    """Disk-backed queue of heavy jobs for one Dataset.
+
+    Jobs live in SQLite, so every gunicorn worker sees and can cancel them.
+    Each worker process runs a small dispatcher thread that claims queued
+    jobs while fewer than CONCURRENCY are running host-wide and runs each in
+    a niced child process, which loads the dataset from its cache, so a
+    long export or fit never occupies a worker that should be serving plots.
+    Cancelling a running job terminates its process.
+    """
+
+    def __init__(self, dataset, path=DB_PATH, job_dir=JOB_DIR, concurrency=CONCURRENCY):
+        self.dataset = dataset
+        self.path = path
+        self.job_dir = job_dir
+        self.concurrency = concurrency
+        self._conn = Connections(path, SCHEMA, sqlite3.Row).get
+        self._children = {}
+        self._dispatcher_pid = None
+
+    def _update(self, job_id, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._conn().execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def submit(self, kind, params):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown job kind {kind!r}")
+        self._prune()
+        job_id = uuid.uuid4().hex[:12]
+        self._conn().execute(
+            "INSERT INTO jobs (id, dataset, kind, params, state, created) VALUES (?, ?, ?, ?, 'queued', ?)",
+            (job_id, self.dataset.name, kind, json.dumps(params), time.time()),
+        )
+        return job_id
+
+    def get(self, job_id):
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ? AND dataset = ?", (job_id, self.dataset.name)).fetchone()
+        return self._record(row) if row else None
+
+    def list(self, limit=10):
+        rows = self._conn().execute(
+            "SELECT * FROM jobs WHERE dataset = ? ORDER BY created DESC LIMIT ?", (self.dataset.name, limit)
+        ).fetchall()
+        return [self._record(row) for row in rows]
+
+    @staticmethod
+    def _record(row):
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["label"] = KINDS.get(job["kind"], (job["kind"],))[0]
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a queued job at once; a running one is terminated by the
+        dispatcher that started it."""
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("UPDATE jobs SET state = 'cancelled', finished = ? WHERE id = ? AND state = 'queued'", (time.time(), job_id))
+            conn.execute("UPDATE jobs SET state = 'cancelling' WHERE id = ? AND state = 'running'", (job_id,))
+        return self.get(job_id)
+
+    def _prune(self):
+        cutoff = time.time() - TTL
+        conn = self._conn()
+        for row in conn.execute("SELECT id, result FROM jobs WHERE finished < ?", (cutoff,)).fetchall():
+            if row["result"]:
+                try:
+                    os.remove(json.loads(row["result"])["path"])
+                except OSError:
+                    pass
+            conn.execute("DELETE FROM jobs WHERE id = ?", (row["id"],))
+
+    # Dispatcher, one per worker process
+
+    def start(self):
+        """Start this process's dispatcher thread, if not already running.
+        Called per request, since threads do not survive fork."""
+        if self._dispatcher_pid != os.getpid():
+            self._dispatcher_pid = os.getpid()
+            self._children = {}
+            threading.Thread(target=self._dispatch, name=f"jobs-{self.dataset.name}", daemon=True).start()
+
+    def _claim(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            running = conn.execute("SELECT COUNT(*) FROM jobs WHERE state IN ('running', 'cancelling')").fetchone()[0]
+            if running >= self.concurrency:
+                return None
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE dataset = ? AND state = 'queued' ORDER BY created LIMIT 1", (self.dataset.name,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE jobs SET state = 'running', pid = ? WHERE id = ?", (os.getpid(), row["id"]))
+        return self._record(row)
+
+    def _reap(self):
+        for job_id, process in list(self._children.items()):
+            job = self.get(job_id)
+            if process.is_alive():
+                if job is None or job["state"] == "cancelling":
+                    process.terminate()
+                continue
+            process.join()
+            del self._children[job_id]
+            if job is not None and job["state"] in ("running", "cancelling"):
+                # Terminated, or died without recording an outcome
+                cancelled = job["state"] == "cancelling"
+                self._update(job_id, state="cancelled" if cancelled else "failed", finished=time.time(),
+                             message=None if cancelled else f"exited with code {process.exitcode}")
+
+    def _recover(self):
+        # Jobs whose dispatcher process is gone (worker restarted) can never finish
+        for row in self._conn().execute("SELECT id, pid FROM jobs WHERE state IN ('running', 'cancelling')").fetchall():
+            try:
+                os.kill(row["pid"], 0)
+            except ProcessLookupError:
+                self._update(row["id"], state="failed", finished=time.time(), message="worker exited")
+            except (PermissionError, TypeError):
+                pass
+
+    def _dispatch(self):
+        self._recover()
+        while True:
+            try:
+                self._reap()
+                job = self._claim()
+                if job is not None:
+                    process = CONTEXT.Process(target=_run_job, args=(self.dataset.name, self.path, self.job_dir, job),
+                                              name=f"job-{job['id']}", daemon=True)
+                    process.start()
+                    self._children[job["id"]] = process
+                    continue
+            except Exception:
+                log.exception("job dispatcher for %s failed", self.dataset.name)
+            time.sleep(POLL_SECONDS)
+
+    def _run(self, job):
+        os.nice(NICE)
+        job_id = job["id"]
+        os.makedirs(self.job_dir, exist_ok=True)
+        path = os.path.join(self.job_dir, f"{job_id}.out")
+        last = [0.0]
+
+        def progress(fraction, message=None):
+            # Throttled so a fast loop doesn't hammer SQLite
+            now = time.monotonic()
+            if now - last[0] >= 0.25 or fraction >= 1:
+                last[0] = now
+                self._update(job_id, progress=float(fraction), message=message)
+                if self._conn().execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()[0] != "running":
+                    raise Cancelled()
+
+        try:
+            name, mimetype = KINDS[job["kind"]][1](self.dataset.snapshot(), job["params"], path, progress)
+        except Cancelled:
+            self._update(job_id, state="cancelled", finished=time.time())
+        except Exception as exc:
+            log.exception("job %s failed", job_id)
+            self._update(job_id, state="failed", finished=time.time(), message=f"{type(exc).__name__}: {exc}")
+        else:
+            result = {"path": path, "name": f"{self.dataset.name}_{name}", "mimetype": mimetype}
+            self._update(job_id, state="done", progress=1.0, finished=time.time(), result=json.dumps(result))
+        finally:
+            if self.get(job_id)["state"] != "done" and os.path.exists(path):
+                os.remove(path)
+
+
+def _run_job(dataset, path, job_dir, job):
+    # Job process entry point: a fresh queue over the dataset as cached on disk
+    JobQueue(load_dataset(dataset), path, job_dir)._run(job)
+
+
+def public(job):
+    return {key: job[key] for key in ("id", "kind", "label", "params", "state", "progress", "message", "created", "finished")}
+
+
+def register(server, queue):
+    """Add /jobs routes: POST /jobs/<kind> with JSON params, GET /jobs/<id>,
+    POST /jobs/<id>/cancel and GET /jobs/<id>/result."""
+    def job_or_404(job_id):
+        job = queue.get(job_id)
+        if job is None:
+            flask.abort(404)
+        return job
+
+    @server.route("/jobs/<kind>", methods=["POST"])
+    def submit_job(kind):
+        if kind not in KINDS:
+            flask.abort(404)
+        params = flask.request.get_json(silent=True) or {}
+        if kind == "export" and params.setdefault("format", "csv.gz") not in export.available_formats():
+            flask.abort(400, f"format must be one of {', '.join(export.available_formats())}")
+        return public(queue.get(queue.submit(kind, params))), 202
+
+    @server.route("/jobs/<job_id>")
+    def job_status(job_id):
+        return public(job_or_404(job_id))
+
+    @server.route("/jobs/<job_id>/cancel", methods=["POST"])
+    def cancel_job(job_id):
+        job_or_404(job_id)
+        return public(queue.cancel(job_id))
+
+    @server.route("/jobs/<job_id>/result")
+    def job_result(job_id):
+        job = job_or_404(job_id)
+        if job["state"] != "done":
+            flask.abort(409, f"job is {job['state']}")
+        result = job["result"]
+        return flask.send_file(os.path.abspath(result["path"]), mimetype=result["mimetype"],
+                               as_attachment=True, download_name=result["name"])
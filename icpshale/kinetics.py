@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+
+from icpshale.figcache import Memo
+from icpshale.schema import CURVE_KEYS
+
+GROUP_KEYS = CURVE_KEYS
+# Initial release rate is the slope over the first INITIAL_DAYS days
+INITIAL_DAYS = 3
+# Rate constants (per day) tried for the plateau model c = a + b * (1 - exp(-k t))
+RATE_GRID = np.geomspace(0.01, 20, 64)
+# Time to plateau is when the model reaches this fraction of its rise
+PLATEAU_FRACTION = 0.95
+# Groups fitted per batch, to bound the (groups, rates, points) arrays
+BATCH_GROUPS = 2048
+MEMO_SIZE = 16
+
+FIT_COLUMNS = GROUP_KEYS + ["n", "initial_rate", "plateau", "rate_constant", "time_to_plateau", "r2"]
+
+
+def padded_groups(rows, keys=GROUP_KEYS, x="Time", y="Concentration"):
+    """Group labels and (groups, max_points) arrays of x, y and a validity
+    mask, each group's points sorted by x. Padding is x = y = 0, mask False."""
+    codes = [pd.factorize(rows[key])[0] for key in keys]
+    xs = rows[x].to_numpy(dtype=np.float64)
+    ys = rows[y].to_numpy(dtype=np.float64)
+    valid = ~(np.isnan(xs) | np.isnan(ys))
+    for c in codes:
+        valid &= c >= 0
+    codes = [c[valid] for c in codes]
+    xs, ys = xs[valid], ys[valid]
+
+    order = np.lexsort([xs] + codes[::-1])
+    codes = [c[order] for c in codes]
+    xs, ys = xs[order], ys[order]
+    n = len(xs)
+    change = np.zeros(n, dtype=bool)
+    if n:
+        change[0] = True
+        for c in codes:
+            change[1:] |= c[1:] != c[:-1]
+    starts = np.flatnonzero(change)
+    gid = np.cumsum(change) - 1
+    pos = np.arange(n) - starts[gid]
+    width = int(pos.max()) + 1 if n else 0
+
+    shape = (len(starts), width)
+    X, Y, M = np.zeros(shape), np.zeros(shape), np.zeros(shape, dtype=bool)
+    X[gid, pos], Y[gid, pos], M[gid, pos] = xs, ys, True
+    labels = pd.DataFrame({
+        key: rows[key].to_numpy()[valid][order][starts] for key in keys
+    })
+    return labels, X, Y, M
+
+
+def _line(x, y, w):
+    """Weighted least-squares a + b*x along the last axis."""
+    sw = w.sum(-1)
+    sx, sy = (w * x).sum(-1), (w * y).sum(-1)
+    sxx, sxy = (w * x * x).sum(-1), (w * x * y).sum(-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        b = (sw * sxy - sx * sy) / (sw * sxx - sx * sx)
+        a = (sy - b * sx) / sw
+    return a, b
+
+
+def fit_padded(X, Y, M):
+    """Initial slope and plateau model for every row of padded arrays."""
+    W = M.astype(np.float64)
+    n = W.sum(1)
+
+    early = W * (X <= INITIAL_DAYS)
+    _, slope = _line(X, Y, early)
+    slope = np.where(early.sum(1) >= 2, slope, np.nan)
+
+    # Linear in (a, b) for a fixed k, so solve every k at once and keep the best
+    E = 1 - np.exp(-RATE_GRID[None, :, None] * X[:, None, :])
+    Wk = W[:, None, :]
+    a, b = _line(E, Y[:, None, :], Wk)
+    with np.errstate(invalid="ignore", over="ignore"):
+        sse = (Wk * (Y[:, None, :] - a[..., None] - b[..., None] * E) ** 2).sum(-1)
+    best = np.nanargmin(np.where(np.isnan(sse), np.inf, sse), axis=1)
+    rows = np.arange(len(X))
+    a, b, sse, k = a[rows, best], b[rows, best], sse[rows, best], RATE_GRID[best]
+    # A best k at either end of the grid only bounds the rate, so it is not reported
+    bounded = (best > 0) & (best < len(RATE_GRID) - 1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (W * Y).sum(1) / n
+        sst = (W * (Y - mean[:, None]) ** 2).sum(1)
+        r2 = 1 - sse / sst
+    enough = n >= 3
+    return pd.DataFrame({
+        "n": n.astype(int),
+        "initial_rate": slope,
+        "plateau": np.where(enough, a + b, np.nan),
+        "rate_constant": np.where(enough & bounded, k, np.nan),
+        "time_to_plateau": np.where(enough & bounded, -np.log(1 - PLATEAU_FRACTION) / k, np.nan),
+        "r2": np.where(enough, r2, np.nan),
+        "_offset": np.where(enough, a, np.nan),
+        "_rise": np.where(enough, b, np.nan),
+        "_rate": np.where(enough, k, np.nan),
+    })
+
+
+def fit_groups(rows):
+    """Fits for every (Shale_ID, Element, Sample_Combo, Sample_Type) curve in `rows`."""
+    labels, X, Y, M = padded_groups(rows)
+    parts = [fit_padded(X[i:i + BATCH_GROUPS], Y[i:i + BATCH_GROUPS], M[i:i + BATCH_GROUPS])
+             for i in range(0, len(X), BATCH_GROUPS)]
+    fits = pd.concat(parts, ignore_index=True) if parts else fit_padded(X, Y, M)
+    return pd.concat([labels, fits], axis=1)
+
+
+def model_curve(fit, t):
+    # The grid's best k, also when it is at an end and not reported as rate_constant
+    return fit["_offset"] + fit["_rise"] * (1 - np.exp(-fit["_rate"] * t))
+
+
+_memo = Memo(MEMO_SIZE)
+
+
+def fits(data, sample_types=None):
+    """fit_groups over the kept rows of a PartitionedData, memoized on the
+    dataset fingerprint, exclusion version and sample-type filter."""
+    key = data.version() + (tuple(sorted(sample_types or [])),)
+    return _memo.get_or_build(key, lambda: fit_groups(data.rows(sample_types=sample_types)))
@@ -0,0 +1,184 @@
+import functools
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+import flask
+
+ENABLED = os.environ.get("ICP_METRICS", "1") != "0"
+# Callbacks slower than this many seconds are logged with their arguments; unset = off
+SLOW_SECONDS = float(os.environ["ICP_SLOW_CALLBACK_SECONDS"]) if os.environ.get("ICP_SLOW_CALLBACK_SECONDS") else None
+
+log = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 10, 100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+BYTES_BUCKETS = (1024, 10_240, 102_400, 1_048_576, 10_485_760, 104_857_600)
+
+HISTOGRAMS = {
+    "icp_callback_duration_seconds": ("Wall time spent in the callback.", SECONDS_BUCKETS),
+    "icp_callback_rows_scanned": ("Rows read from the partitioned table.", COUNT_BUCKETS),
+    "icp_callback_rows_returned": ("Rows left after filtering and exclusions.", COUNT_BUCKETS),
+    "icp_callback_traces": ("Traces in the returned figure.", COUNT_BUCKETS),
+    "icp_callback_points": ("Points across all traces of the returned figure.", COUNT_BUCKETS),
+    "icp_callback_response_bytes": ("Size of the callback HTTP response.", BYTES_BUCKETS),
+}
+
+_active = threading.local()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Per-process histograms keyed by (metric, callback)."""
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, callback, values):
+        with self._lock:
+            for metric, value in values.items():
+                if value is None:
+                    continue
+                hist = self._histograms.get((metric, callback))
+                if hist is None:
+                    hist = self._histograms[(metric, callback)] = Histogram(HISTOGRAMS[metric][1])
+                hist.observe(value)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for metric, (help_text, _) in HISTOGRAMS.items():
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+                for (name, callback), hist in sorted(self._histograms.items()):
+                    if name != metric:
+                        continue
+                    label = f'callback="{callback}"'
+                    total = 0
+                    for bound, n in zip(hist.buckets + ("+Inf",), hist.counts):
+                        total += n
+                        lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {total}')
+                    lines.append(f"{metric}_sum{{{label}}} {hist.sum}")
+                    lines.append(f"{metric}_count{{{label}}} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def count(rows_scanned=0, rows_returned=0):
+    """Add to the row counters of the callback running on this thread, if any."""
+    record = getattr(_active, "record", None)
+    if record is not None:
+        record["icp_callback_rows_scanned"] += rows_scanned
+        record["icp_callback_rows_returned"] += rows_returned
+
+
+def _trace_list(result):
+    if isinstance(result, flask.Response):
+        # Routes; reading .data would also drain a streamed body
+        return None
+    fig = result[0] if isinstance(result, (list, tuple)) and result else result
+    traces = fig.get("data") if isinstance(fig, dict) else getattr(fig, "data", None)
+    return traces if isinstance(traces, (list, tuple)) else None
+
+
+def _length(values):
+    # Typed arrays are {"dtype": "f4", "bdata": base64}; count them without decoding
+    if isinstance(values, dict) and "bdata" in values:
+        data = values["bdata"]
+        return (len(data) * 3 // 4 - data[-2:].count("=")) // int(values["dtype"][1:])
+    return len(values) if values is not None and not isinstance(values, str) else 0
+
+
+def _traces(result):
+    traces = _trace_list(result)
+    return len(traces) if traces is not None else None
+
+
+def _points(result):
+    traces = _trace_list(result)
+    if traces is None:
+        return None
+    return sum(_length(trace.get("x") if isinstance(trace, dict) else trace.x) for trace in traces)
+
+
+def instrument(name):
+    """Time a Dash callback or Flask route and record its row, trace, point
+    and response-size histograms; streamed responses are recorded when the
+    stream ends. A no-op when ICP_METRICS=0."""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            record = {"icp_callback_rows_scanned": 0, "icp_callback_rows_returned": 0}
+            _active.record = record
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                _active.record = None
+                record["icp_callback_duration_seconds"] = elapsed = time.perf_counter() - start
+            record["icp_callback_traces"] = _traces(result)
+            record["icp_callback_points"] = _points(result)
+            if SLOW_SECONDS is not None and elapsed >= SLOW_SECONDS:
+                log.warning("slow callback %s took %.3fs args=%.2000r kwargs=%.2000r", name, elapsed, args, kwargs)
+            if flask.has_request_context():
+                # Response size is only known once Dash has serialized the result
+                flask.g.icp_callback = (name, record, start)
+            else:
+                registry.observe(name, record)
+            return result
+        return wrapper
+    return decorate
+
+
+def _counted(chunks, name, record, start):
+    # A streamed download is recorded once its last chunk is sent, timed from the start of the handler
+    size = 0
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+        record["icp_callback_response_bytes"] = size
+        record["icp_callback_duration_seconds"] = time.perf_counter() - start
+        registry.observe(name, record)
+
+
+def register(server):
+    """Add the /metrics route and the response-size hook to a Flask server."""
+    @server.after_request
+    def observe_response(response):
+        pending = flask.g.pop("icp_callback", None)
+        if pending is not None:
+            name, record, start = pending
+            if response.is_streamed:
+                response.response = _counted(response.response, name, record, start)
+            else:
+                record["icp_callback_response_bytes"] = response.calculate_content_length()
+                registry.observe(name, record)
+        return response
+
+    @server.route("/metrics")
+    def metrics():
+        return flask.Response(registry.render(), mimetype="text/plain; version=0.0.4")
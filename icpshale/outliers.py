@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from icpshale.figcache import Memo
+from icpshale.schema import CURVE_KEYS
+
+GROUP_KEYS = CURVE_KEYS
+# Modified z-score cut-off (Iglewicz and Hoaglin)
+THRESHOLD = 3.5
+METHODS = {"zscore": "Robust z-score", "neighbours": "Neighbour residual"}
+MEMO_SIZE = 16
+
+OUTLIER_COLUMNS = ["Shale_ID", "Element", "Sample_Combo", "Sample_ID", "Sample_Type", "Time", "Concentration", "score"]
+
+
+def _robust_z(values, groups):
+    """0.6745 * (x - median) / MAD within each group."""
+    med = values.groupby(groups, observed=True).transform("median")
+    dev = (values - med).abs()
+    mad = dev.groupby(groups, observed=True).transform("median")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return 0.6745 * (values - med) / mad.where(mad > 0)
+
+
+def scores(rows, method="zscore"):
+    """Outlier score for every row, computed for all curves in one pass.
+
+    zscore: robust z of the value within its curve.
+    neighbours: robust z of the residual against the mean of the previous
+    and next timepoints, so a smooth trend is not itself flagged.
+    """
+    groups = [rows[key] for key in GROUP_KEYS]
+    values = rows["Concentration"].astype(np.float64)
+    if method == "zscore":
+        return _robust_z(values, groups)
+
+    order = np.lexsort([rows["Time"].to_numpy()] + [pd.factorize(g)[0] for g in groups[::-1]])
+    ordered = values.iloc[order]
+    keys = [g.iloc[order] for g in groups]
+    by = ordered.groupby(keys, observed=True)
+    prev, nxt = by.shift(1), by.shift(-1)
+    # Ends of a curve only have one neighbour
+    expected = pd.concat([prev, nxt], axis=1).mean(axis=1)
+    residual = ordered - expected
+    return _robust_z(residual, keys).reindex(rows.index)
+
+
+_memo = Memo(MEMO_SIZE)
+
+
+def detect(data, method="zscore", threshold=THRESHOLD, sample_types=None):
+    """Kept rows of a PartitionedData whose |score| exceeds threshold,
+    memoized on the dataset and exclusion version."""
+    key = data.version() + (method, threshold, tuple(sorted(sample_types or [])))
+
+    def build():
+        rows = data.rows(sample_types=sample_types)
+        score = scores(rows, method)
+        over = (score.abs() > threshold).to_numpy()
+        flagged = rows[over].assign(score=score.to_numpy()[over])
+        return flagged[[c for c in OUTLIER_COLUMNS if c in flagged.columns]]
+    return _memo.get_or_build(key, build)
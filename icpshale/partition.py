@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+
+from icpshale import metrics
+
+
+def partition_order(df):
+    """Row positions of df grouped into (Shale_ID, Element) slices, each with
+    its Sample_Combo runs contiguous in order of first appearance. Rows
+    without a shale or element are left out."""
+    shale_codes, _ = pd.factorize(df["Shale_ID"])
+    element_codes, elements = pd.factorize(df["Element"])
+    combo_codes, _ = pd.factorize(df["Sample_Combo"])
+    rows = np.flatnonzero((shale_codes >= 0) & (element_codes >= 0))
+    order = rows[np.lexsort((element_codes[rows], shale_codes[rows]))]
+    group = shale_codes[order] * len(elements) + element_codes[order]
+    # Make each combo contiguous while keeping its first-appearance order
+    first = pd.Series(np.arange(len(order))).groupby([group, combo_codes[order]]).transform("min").to_numpy()
+    return order[np.argsort(first, kind="stable")]
+
+
+def in_partition_order(df):
+    """df reordered for PartitionedData; cache frames this way so loading
+    them wraps the memory-mapped columns without a reordering copy."""
+    order = partition_order(df)
+    return df if _is_identity(order, len(df)) else df.iloc[order]
+
+
+def _is_identity(order, n):
+    return len(order) == n and bool((order == np.arange(n)).all())
+
+
+class PartitionedData:
+    """Long ICP table reordered into contiguous (Shale_ID, Element) slices.
+
+    Within each slice rows are grouped by Sample_Combo (in order of first
+    appearance), so a plot only ever touches the rows it draws. Removed points
+    live in an optional ExclusionStore and are masked out on read.
+    """
+
+    def __init__(self, df, exclusions=None):
+        order = partition_order(df)
+        # Frames cached in partition order are used as they are, still memory-mapped
+        self.frame = df if _is_identity(order, len(df)) else df.iloc[order]
+        shale_codes, shales = pd.factorize(self.frame["Shale_ID"])
+        element_codes, elements = pd.factorize(self.frame["Element"])
+        combo, _ = pd.factorize(self.frame["Sample_Combo"])
+        group = shale_codes * len(elements) + element_codes
+        self.exclusions = exclusions
+        self.slices = {}
+        self.combo_offsets = {}
+        self.elements = {}
+
+        n = len(order)
+        group_starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]]) if n else np.array([], dtype=int)
+        combo_starts = np.flatnonzero(np.r_[True, (group[1:] != group[:-1]) | (combo[1:] != combo[:-1])]) if n else np.array([], dtype=int)
+        combo_names = self.frame["Sample_Combo"].to_numpy()
+        for start, stop in zip(group_starts, np.r_[group_starts[1:], n]):
+            shale, element = shales[group[start] // len(elements)], elements[group[start] % len(elements)]
+            self.slices[(shale, element)] = (int(start), int(stop))
+            inner = combo_starts[(combo_starts >= start) & (combo_starts < stop)]
+            self.combo_offsets[(shale, element)] = [
+                (combo_names[a], int(a), int(b)) for a, b in zip(inner, np.r_[inner[1:], stop])
+            ]
+            self.elements.setdefault(shale, []).append(element)
+        self.elements = {shale: sorted(elems) for shale, elems in self.elements.items()}
+        self.shales = sorted(self.elements)
+
+    def _keep(self, start, stop, sample_types, element=None):
+        rows = self.frame.iloc[start:stop]
+        keep = np.ones(stop - start, dtype=bool)
+        if sample_types:
+            keep &= rows["Sample_Type"].isin(sample_types).to_numpy()
+        if self.exclusions is not None and len(rows):
+            excluded = self.exclusions.mask(rows, element)
+            if excluded is not None:
+                keep &= ~excluded
+        metrics.count(stop - start, int(keep.sum()))
+        return rows, keep
+
+    def _split(self, key, start, rows, keep):
+        out = []
+        for combo, a, b in self.combo_offsets.get(key, []):
+            mask = keep[a - start:b - start]
+            if mask.any():
+                subset = rows.iloc[a - start:b - start]
+                out.append((combo, subset if mask.all() else subset[mask]))
+        return out
+
+    def select(self, shale, element, sample_types=None):
+        rows, keep = self._keep(*self.slices.get((shale, element), (0, 0)), sample_types, element)
+        return rows if keep.all() else rows[keep]
+
+    def combos(self, shale, element, sample_types=None):
+        start, stop = self.slices.get((shale, element), (0, 0))
+        rows, keep = self._keep(start, stop, sample_types, element)
+        return self._split((shale, element), start, rows, keep)
+
+    def shale_combos(self, shale, sample_types=None):
+        """(element, combos) for every element of a shale. A shale's slices are
+        adjacent, so the whole panel is masked in one pass."""
+        bounds = [self.slices[(shale, element)] for element in self.elements.get(shale, [])]
+        if not bounds:
+            return []
+        start, stop = min(b[0] for b in bounds), max(b[1] for b in bounds)
+        rows, keep = self._keep(start, stop, sample_types)
+        return [
+            (element, self._split((shale, element), start, rows, keep))
+            for element in self.elements[shale]
+        ]
+
+    def rows(self, shale=None, element=None, sample_types=None):
+        """Kept rows of a selection in partition order; any filter may be None."""
+        if shale is None:
+            start, stop = 0, len(self.frame)
+        elif element is None:
+            bounds = [self.slices[(shale, e)] for e in self.elements.get(shale, [])] or [(0, 0)]
+            start, stop = min(b[0] for b in bounds), max(b[1] for b in bounds)
+        else:
+            start, stop = self.slices.get((shale, element), (0, 0))
+        rows, keep = self._keep(start, stop, sample_types)
+        if shale is None and element is not None:
+            keep &= (rows["Element"] == element).to_numpy()
+        return rows if keep.all() else rows[keep]
+
+    def version(self, element=None):
+        """Dataset fingerprint and exclusion version, for use in cache keys."""
+        excluded = self.exclusions.version(element) if self.exclusions is not None else 0
+        return self.frame.attrs.get("fingerprint"), excluded
+
+    def exclude(self, element, sample_id, time):
+        return self.exclusions.add(element, sample_id, time)
+
+    def exclude_many(self, rows):
+        """Exclude every row of a frame with Element, Sample_ID and Time columns."""
+        return self.exclusions.add_many(rows[["Element", "Sample_ID", "Time"]].itertuples(index=False, name=None))
+
+    def reset(self):
+        return self.exclusions.clear()
+
+    def kept(self):
+        # Back in the original row order, e.g. for downloads
+        frame = self.frame.sort_index()
+        excluded = self.exclusions.mask(frame) if self.exclusions is not None else None
+        frame = frame if excluded is None else frame[~excluded]
+        metrics.count(len(self.frame), len(frame))
+        return frame
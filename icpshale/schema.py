@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+# Treatment conditions by Group letter
+OXYGEN_GROUPS = ["A", "D"]  # O2 present
+CO2_GROUPS = ["A", "B"]     # CO2 present
+
+# Rows sharing these form one measured curve. Disk and Dust replicates of a
+# combo sit at different levels, so fits, outlier scores and t0 normalization
+# never pool them.
+CURVE_KEYS = ["Shale_ID", "Element", "Sample_Combo", "Sample_Type"]
+
+CATEGORY_COLUMNS = ["Sample_ID", "Sample_Type", "Group", "Sample_Number", "Sample_Combo", "Experiment", "Element", "Shale_ID"]
+FLOAT32_COLUMNS = ["Concentration"]
+FLOAT64_COLUMNS = ["Time"]
+# Index left over from an earlier to_csv, and per-row flags now looked up from Group
+DROP_COLUMNS = ["Unnamed: 0", "O2", "CO2"]
+
+
+def enforce_schema(df):
+    """Compact in-memory form of the long ICP table: string columns as
+    categoricals, concentrations as float32."""
+    df = df.drop(columns=[c for c in DROP_COLUMNS if c in df.columns])
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    for col in FLOAT32_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(np.float32)
+    for col in FLOAT64_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(np.float64)
+    return df
+
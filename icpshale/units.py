@@ -0,0 +1,82 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+# g/mol, used to convert between mass and molar concentrations
+MOLAR_MASSES = {
+    "Li": 6.94, "Na": 22.99, "Mg": 24.31, "Al": 26.98, "Si": 28.09, "K": 39.10, "Ca": 40.08,
+    "Ti": 47.87, "Cr": 51.99, "Mn": 54.94, "Fe": 55.85, "Co": 58.93, "Ni": 58.69, "Cu": 63.55,
+    "Zn": 65.38, "As": 74.92, "Sr": 87.62, "Mo": 95.95, "Cd": 112.41, "Ba": 137.33, "Pb": 207.2
+}
+
+# Each unit as (kind, scale) relative to µg/L for mass and µmol/L for molar units
+UNITS = {
+    "ppb": ("mass", 1.0),
+    "µg/L": ("mass", 1.0),
+    "ug/L": ("mass", 1.0),
+    "µg·L⁻¹": ("mass", 1.0),
+    "ppm": ("mass", 1000.0),
+    "mg/L": ("mass", 1000.0),
+    "µM": ("molar", 1.0),
+    "uM": ("molar", 1.0),
+    "mM": ("molar", 1000.0),
+}
+
+# Rows of the long table that are not concentrations and are never converted
+NON_CONCENTRATIONS = ["pH", "O2"]
+
+log = logging.getLogger(__name__)
+
+
+def _unit(name):
+    if name not in UNITS:
+        raise ValueError(f"Unknown concentration unit: {name!r}")
+    return UNITS[name]
+
+
+def get_units(df, column="Concentration"):
+    return df.attrs.get("units", {}).get(column)
+
+
+def set_units(df, unit, column="Concentration"):
+    """Record the unit of a column without converting its values."""
+    _unit(unit)
+    df.attrs["units"] = {**df.attrs.get("units", {}), column: unit}
+    return df
+
+
+def element_molar_masses(elements):
+    # Look up each distinct element once and broadcast back through the codes
+    codes, uniques = pd.factorize(elements)
+    masses = np.array([MOLAR_MASSES.get(e, np.nan) for e in uniques] + [np.nan])
+    return masses[codes]
+
+
+def convert_units(df, to, column="Concentration", element="Element", source=None):
+    """Convert a concentration column in place from its recorded unit to `to`.
+
+    pH and O2 rows pass through unchanged. Converting between mass and molar
+    units needs a molar mass, so elements without one are left unchanged (and
+    logged). Converting to the recorded unit is a no-op.
+    """
+    current = get_units(df, column)
+    if current is None:
+        if source is None:
+            raise ValueError(f"No unit recorded for {column!r}; pass source=")
+        current = source
+    src_kind, src_scale = _unit(current)
+    dst_kind, dst_scale = _unit(to)
+    if current != to:
+        factor = np.full(len(df), src_scale / dst_scale)
+        if src_kind != dst_kind:
+            masses = element_molar_masses(df[element])
+            factor = factor / masses if dst_kind == "molar" else factor * masses
+            unknown = np.isnan(masses)
+            skipped = set(pd.unique(df[element][unknown])) - set(NON_CONCENTRATIONS)
+            if skipped:
+                log.warning("no molar mass for %s; left in %s", ", ".join(sorted(map(str, skipped))), current)
+            factor[unknown] = 1.0
+        factor[df[element].isin(NON_CONCENTRATIONS).to_numpy()] = 1.0
+        df[column] = df[column].to_numpy(dtype=float) * factor
+    return set_units(df, to, column)
@@ -0,0 +1,130 @@
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import plotly.io as pio
+from plotly.io.json import to_json_plotly
+from plotly.offline import get_plotlyjs
+
+# Background warm-up is opt-in; it shares the GIL with requests, so one thread by default
+ENABLED = os.environ.get("ICP_WARMUP", "0") == "1"
+THREADS = int(os.environ.get("ICP_WARMUP_THREADS", 1))
+
+log = logging.getLogger(__name__)
+
+
+def catalogue(data, sample_types):
+    """Every (shale, element, sample types) of a snapshot, with each sample
+    type on its own and all of them together."""
+    choices = [[t] for t in sample_types] + ([list(sample_types)] if len(sample_types) > 1 else [])
+    return [(shale, element, types) for shale in data.shales for element in data.elements[shale] for types in choices]
+
+
+class Warmup:
+    """Builds every catalogue figure of the current snapshot in a thread pool
+    so the first user of each selection hits a warm figure cache.
+
+    fill(data, shale, element, sample_types) builds one figure into the
+    cache. Like the reload watcher this is started per worker process on its
+    first request, and never holds that request up.
+    """
+
+    def __init__(self, dataset, combos, fill, threads=THREADS):
+        self.dataset = dataset
+        self.combos = combos
+        self.fill = fill
+        self.threads = threads
+        self.total = self.done = self.failed = 0
+        self.seconds = None
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def start(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name=f"warmup-{self.dataset.name}", daemon=True).start()
+
+    def _one(self, data, combo):
+        # A reload makes the rest stale; requests fill the new snapshot's entries
+        if self.dataset.snapshot() is not data:
+            return
+        try:
+            self.fill(data, *combo)
+        except Exception:
+            log.exception("warming %s failed", combo)
+            with self._lock:
+                self.failed += 1
+        else:
+            with self._lock:
+                self.done += 1
+
+    def _run(self):
+        data = self.dataset.snapshot()
+        combos = self.combos(data)
+        with self._lock:
+            self.total, self.done, self.failed, self.seconds = len(combos), 0, 0, None
+        start = time.perf_counter()
+        with ThreadPoolExecutor(self.threads, thread_name_prefix="warmup") as pool:
+            for combo in combos:
+                pool.submit(self._one, data, combo)
+        self.seconds = time.perf_counter() - start
+        log.info("warmed %d of %d %s figures in %.1fs", self.done, self.total, self.dataset.name, self.seconds)
+
+    def stats(self):
+        with self._lock:
+            return {"enabled": ENABLED, "total": self.total, "done": self.done, "failed": self.failed, "seconds": self.seconds}
+
+
+# Set in the parent before the pool forks, so workers inherit the loaded data
+_job = None
+
+
+def _filename(shale, element, sample_types, ext):
+    return f"{shale}_{element}_{'-'.join(sample_types)}{ext}".replace("/", "-")
+
+
+def _write(combo):
+    data, render, out, fmt = _job
+    shale, element, sample_types = combo
+    fig = render(data, shale, element, sample_types)
+    name = _filename(shale, element, sample_types, "." + fmt)
+    if fmt == "html":
+        # One shared plotly.min.js next to the pages instead of 3 MB inlined in each
+        pio.write_html(fig, os.path.join(out, name), include_plotlyjs="directory", full_html=True)
+    else:
+        with open(os.path.join(out, name), "w") as f:
+            f.write(to_json_plotly(fig))
+    return {"shale": shale, "element": element, "sample_types": sample_types, "file": name}
+
+
+def prerender(data, combos, render, out, fmt="json", processes=None):
+    """Write the figure of every combo to `out` as plotly JSON or standalone
+    HTML, built in a pool of forked processes, plus an index.json (and an
+    index.html for HTML). render(data, shale, element, sample_types) returns
+    a figure. Returns the index entries."""
+    global _job
+    os.makedirs(out, exist_ok=True)
+    if fmt == "html":
+        with open(os.path.join(out, "plotly.min.js"), "w") as f:
+            f.write(get_plotlyjs())
+    _job = (data, render, out, fmt)
+    try:
+        with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("fork")) as pool:
+            index = list(pool.map(_write, combos, chunksize=8))
+    finally:
+        _job = None
+
+    with open(os.path.join(out, "index.json"), "w") as f:
+        json.dump(index, f, indent=1)
+    if fmt == "html":
+        links = "\n".join(
+            f'<li><a href="{e["file"]}">Shale {e["shale"]}: {e["element"]} ({", ".join(e["sample_types"])})</a></li>'
+            for e in index
+        )
+        with open(os.path.join(out, "index.html"), "w") as f:
+            f.write(f"<!DOCTYPE html>\n<html><body><ul>\n{links}\n</ul></body></html>\n")
+    return index
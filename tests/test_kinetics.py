@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+
+from icpshale import kinetics
+
+
+def curve(sample_type, level, times):
+    return pd.DataFrame({
+        "Shale_ID": "64", "Element": "Ca", "Sample_Combo": "64A", "Sample_Type": sample_type,
+        "Time": times, "Concentration": level * (1 - np.exp(-0.5 * times)),
+    })
+
+
+def test_sample_types_are_fitted_separately():
+    times = np.array([0, 0.5, 1, 2, 3, 4, 7, 9, 15, 18, 23, 42], dtype=float)
+    rows = pd.concat([curve("Disk", 10.0, times), curve("Dust", 100.0, times)], ignore_index=True)
+
+    fits = kinetics.fit_groups(rows).set_index("Sample_Type")
+
+    assert sorted(fits.index) == ["Disk", "Dust"]
+    assert (fits["n"] == len(times)).all()
+    np.testing.assert_allclose(fits.loc["Disk", "plateau"], 10.0, rtol=0.05)
+    np.testing.assert_allclose(fits.loc["Dust", "plateau"], 100.0, rtol=0.05)
+    assert (fits["r2"] > 0.99).all()